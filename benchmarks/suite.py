@@ -0,0 +1,213 @@
+"""
+Benchmark suite on synthetic Bushnell-style clips.
+
+Generates test clips with ffmpeg's testsrc source at 720p, 1080p and 4K, with
+a 110x110 orange square in the bottom-left corner and a 56-pixel white info
+bar across the bottom, like the camera's watermark. Times patch_frame,
+extract_frames, patch_frames and assemble_video on their own, then every
+engine end to end through process_video, and stores the results as JSON
+together with the CLI's startup time.
+Given a saved baseline, it prints how each measurement moved:
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --sizes 720p --baseline results.json --output new.json
+
+Clips are cached in --clip-dir, so reruns only pay for the benchmarks.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import watermark_remover as wr  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "watermark_remover.py")
+
+SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# name -> extra command-line options for process_video
+ENGINES = {
+    "disk": ["--engine", "disk"],
+    "pipelined": ["--engine", "pipelined"],
+    "memmap": ["--engine", "memmap"],
+    "shm": ["--engine", "shm"],
+    "stream": ["--engine", "stream"],
+    "strip": ["--engine", "strip"],
+    "filtergraph": ["--engine", "filtergraph"],
+    "stream-segments": ["--engine", "stream", "--segments", "2"],
+}
+
+
+def make_clip(path, width, height, seconds, fps):
+    """Render a testsrc clip with the orange logo and the white info bar burned in."""
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    overlay = (
+        "drawbox=x=0:y=ih-56:w=iw:h=56:color=white:t=fill,"
+        "drawbox=x=0:y=ih-110:w=110:h=110:color=0xFF8C00:t=fill"
+    )
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-vf", overlay,
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", "-pix_fmt", "yuv420p",
+        str(path)
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn quietly and return (seconds, result)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def entry(seconds, frames):
+    return {"seconds": seconds, "fps": frames / seconds if frames and seconds > 0 else None, "frames": frames}
+
+
+def bench_startup(repeat):
+    """Best-of-repeat wall time of a fresh interpreter running --help, and of importing the module."""
+    commands = {
+        "startup:--help": [sys.executable, SCRIPT, "--help"],
+        "startup:import": [sys.executable, "-c", f"import sys; sys.path.insert(0, {os.path.dirname(SCRIPT)!r}); import watermark_remover"],
+    }
+    results = {}
+    for name, cmd in commands.items():
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        results[name] = entry(min(times), 0)
+    return results
+
+
+def bench_functions(clip, probe, geometry, workdir, args):
+    """Time the disk engine's building blocks one at a time."""
+    results = {}
+    tmpdir = workdir / "frames"
+    video_args = wr.encoder_args(args.encoder)
+
+    seconds, _ = timed(wr.extract_frames, str(clip), str(tmpdir))
+    frame_files = sorted(f for f in os.listdir(tmpdir) if f.endswith(".png"))
+    results["extract_frames"] = entry(seconds, len(frame_files))
+
+    repeat = min(args.repeat, len(frame_files))
+    best = min(timed(wr.patch_frame, frame_files[i], str(tmpdir), geometry)[0] for i in range(repeat))
+    results["patch_frame"] = entry(best, 1)
+
+    seconds, patched = timed(wr.patch_frames, str(tmpdir), geometry, args.jobs, progress=False, workers=args.workers)
+    results["patch_frames"] = entry(seconds, patched)
+
+    seconds, _ = timed(wr.assemble_video, str(tmpdir), str(workdir / "assembled.mp4"), probe.fps, video_args)
+    results["assemble_video"] = entry(seconds, len(frame_files))
+    shutil.rmtree(tmpdir)
+    return results
+
+
+def bench_engines(clip, probe, workdir, args):
+    """Run every engine end to end, as the command line would."""
+    results = {}
+    for name in args.engines:
+        output = workdir / f"{name}.mp4"
+        argv = [str(clip), "-o", str(output), "--encoder", args.encoder, "-j", str(args.jobs), "--no-cache", "--no-resume", *ENGINES[name]]
+        engine_args = wr.parse_args(argv)
+        seconds, stats = timed(wr.process_video, clip, output, workdir / f"frames_{name}", engine_args, None, False)
+        results[f"engine:{name}"] = dict(entry(seconds, probe.frame_count or 0), ok=stats["ok"], stages=stats["report"]["stages"])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print each measurement against the baseline; return the number of regressions beyond tolerance."""
+    regressions = 0
+    print(f"\n{'size':<7} {'benchmark':<24} {'baseline s':>11} {'now s':>9} {'change':>8}")
+    for size, benches in results["results"].items():
+        for name, now in benches.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before:
+                print(f"{size:<7} {name:<24} {'-':>11} {now['seconds']:>9.3f} {'new':>8}")
+                continue
+            change = now["seconds"] / before["seconds"] - 1 if before["seconds"] > 0 else 0.0
+            flag = ""
+            if change > tolerance:
+                flag = "  slower"
+                regressions += 1
+            elif change < -tolerance:
+                flag = "  faster"
+            print(f"{size:<7} {name:<24} {before['seconds']:>11.3f} {now['seconds']:>9.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the watermark remover on synthetic clips.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--seconds", type=float, default=2, help="Clip length in seconds (default: 2)")
+    parser.add_argument("--fps", type=int, default=25, help="Clip frame rate (default: 25)")
+    parser.add_argument("--encoder", choices=list(wr.ENCODER_PROFILES), default="fast", help="Encoder profile for every run (default: fast)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Patch workers (default: all cores)")
+    parser.add_argument("--workers", choices=["process", "thread", "auto"], default="auto", help="Worker kind for patch_frames (default: auto)")
+    parser.add_argument("--repeat", type=int, default=5, help="patch_frame calls per size and startup runs; the best is kept (default: 5)")
+    parser.add_argument("--clip-dir", type=Path, default=Path(tempfile.gettempdir()) / "watermark-remover-bench", help="Where generated clips are cached")
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"), help="JSON file for the results (default: benchmark.json)")
+    parser.add_argument("--baseline", type=Path, help="Earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative slowdown reported as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    wr.check_ffmpeg()
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "config": {"seconds": args.seconds, "fps": args.fps, "encoder": args.encoder, "jobs": args.jobs, "workers": args.workers},
+        "results": {"startup": bench_startup(args.repeat)},
+    }
+    for name, result in results["results"]["startup"].items():
+        print(f"   {name:<24} {result['seconds']:>8.3f}s")
+    for size in args.sizes:
+        width, height = SIZES[size]
+        clip = args.clip_dir / f"bushnell_{size}_{args.seconds:g}s_{args.fps}fps.mp4"
+        print(f"🎬 {size}: preparing {clip}")
+        make_clip(clip, width, height, args.seconds, args.fps)
+        probe = wr.probe_video(str(clip))
+        geometry = wr.PatchGeometry(probe.width, probe.height)
+        with tempfile.TemporaryDirectory(dir=args.clip_dir) as workdir:
+            workdir = Path(workdir)
+            size_results = bench_functions(clip, probe, geometry, workdir, args)
+            size_results.update(bench_engines(clip, probe, workdir, args))
+        results["results"][size] = size_results
+        for name, result in size_results.items():
+            fps = f"{result['fps']:.1f} fps" if result["fps"] else ""
+            print(f"   {name:<24} {result['seconds']:>8.3f}s  {fps}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {regressions} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare thread and process workers for patching extracted frames.
+
+For each frame size, writes a set of synthetic frames to a temporary directory
+and patches them with patch_frame on a thread pool and on a process pool, the
+two options behind --workers. Patching is idempotent, so both runs reuse the
+same files:
+
+    python benchmarks/workers.py --frames 64 --jobs 4 --temp-format png
+"""
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from watermark_remover import TEMP_FORMATS, PatchGeometry, patch_frame, write_temp_frame  # noqa: E402
+from temp_formats import synthetic_frame  # noqa: E402
+
+SIZES = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def run(pool_cls, fnames, worker_fn, jobs):
+    start = time.perf_counter()
+    with pool_cls(max_workers=jobs) as pool:
+        results = list(pool.map(worker_fn, fnames, chunksize=1))
+    elapsed = time.perf_counter() - start
+    if not all(results):
+        raise RuntimeError("some frames failed to patch")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thread against process patch workers across frame sizes.")
+    parser.add_argument("--frames", type=int, default=64, help="Frames per size (default: 64)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Workers per pool (default: all cores)")
+    parser.add_argument("--temp-format", choices=list(TEMP_FORMATS), default="png")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    args = parser.parse_args()
+
+    ext = TEMP_FORMATS[args.temp_format]["ext"]
+    print(f"{args.frames} {args.temp_format} frames per size, {args.jobs} workers (pool start-up included)")
+    print(f"{'size':<6} {'threads fps':>12} {'processes fps':>14} {'faster':>9}")
+    for name in args.sizes:
+        width, height = SIZES[name]
+        geometry = PatchGeometry(width, height)
+        frame = synthetic_frame(width, height)
+        with tempfile.TemporaryDirectory() as workdir:
+            fnames = [f"frame_{i:05d}{ext}" for i in range(1, args.frames + 1)]
+            for fname in fnames:
+                write_temp_frame(os.path.join(workdir, fname), frame, args.temp_format)
+            worker_fn = functools.partial(patch_frame, input_dir=workdir, geometry=geometry, temp_format=args.temp_format)
+            thread_s = run(ThreadPoolExecutor, fnames, worker_fn, args.jobs)
+            process_s = run(ProcessPoolExecutor, fnames, worker_fn, args.jobs)
+        faster = "threads" if thread_s < process_s else "processes"
+        print(f"{name:<6} {args.frames / thread_s:>12.1f} {args.frames / process_s:>14.1f} {faster:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,47 +7,809 @@ import shutil
 import subprocess
 import time
 import glob
+import hashlib
+import collections
+import contextlib
+import json
+import threading
+import queue
+import multiprocessing
+import multiprocessing.util
+import cProfile
+import pstats
 from pathlib import Path
 import functools
+import itertools
+import statistics
+import bisect
+import platform
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
-import cv2
-import numpy as np
-from tqdm import tqdm
-from tqdm.contrib.concurrent import process_map
+# cv2, numpy and tqdm are imported inside the functions that use them, so
+# --help, the ffmpeg-only engines and freshly started workers skip loading them.
 
+# Named encoder settings for the final video. "archive" is the original
+# libx264/veryslow behaviour; the others trade file size for throughput.
+# A preset or crf of None means the codec has no such knob. "fallback" names
+# the profile used instead when ffmpeg was built without the codec; "mp4_tag"
+# is the codec tag to write into MP4 and MOV outputs (see codec_tag_args).
+ENCODER_PROFILES = {
+    "archive": {"codec": "libx264", "preset": "veryslow", "crf": 18, "pix_fmt": "yuv420p"},
+    "balanced": {"codec": "libx264", "preset": "medium", "crf": 20, "pix_fmt": "yuv420p"},
+    "fast": {"codec": "libx264", "preset": "veryfast", "crf": 23, "pix_fmt": "yuv420p"},
+    "hevc": {"codec": "libx265", "preset": "medium", "crf": 22, "pix_fmt": "yuv420p",
+             "extra": ["-x265-params", "log-level=error"], "mp4_tag": "hvc1", "fallback": "balanced"},
+    "av1": {"codec": "libsvtav1", "preset": "8", "crf": 32, "pix_fmt": "yuv420p", "fallback": "hevc"},
+    # Lossless and intra-only, for clips that will be edited or re-encoded later.
+    "lossless-intermediate": {"codec": "ffv1", "preset": None, "crf": None, "pix_fmt": None,
+                              "extra": ["-level", "3", "-g", "1"], "extension": ".mkv"},
+}
+DEFAULT_ENCODER_PROFILE = "archive"
+
+# cv2.IMWRITE_PNG_COMPRESSION, spelled out so the table does not need OpenCV loaded.
+IMWRITE_PNG_COMPRESSION = 16
+
+# Intermediate frame formats for the disk-based engines: file extension, extra
+# ffmpeg options for extraction, cv2.imwrite parameters and the decoder the
+# pipelined encoder reads them back with. "npy" frames are raw BGR arrays
+# written and read by NumPy, with no image codec involved at all.
+TEMP_FORMATS = {
+    "png": {"ext": ".png", "ffmpeg": [], "imwrite": [], "codec": "png"},
+    "png0": {"ext": ".png", "ffmpeg": ["-compression_level", "0"], "imwrite": [IMWRITE_PNG_COMPRESSION, 0], "codec": "png"},
+    "bmp": {"ext": ".bmp", "ffmpeg": [], "imwrite": [], "codec": "bmp"},
+    "ppm": {"ext": ".ppm", "ffmpeg": [], "imwrite": [], "codec": "ppm"},
+    "npy": {"ext": ".npy", "ffmpeg": None, "imwrite": None, "codec": None},
+}
+
+def encoder_args(profile=DEFAULT_ENCODER_PROFILE, crf=None, preset=None, threads=None):
+    """
+    Build the ffmpeg video encoding arguments for a named encoder profile.
+
+    crf and preset override the profile's values when the codec supports them;
+    threads limits the encoder's thread count (default: let ffmpeg decide).
+    """
+    settings = ENCODER_PROFILES[profile]
+    args = ["-c:v", settings["codec"]]
+    if settings["crf"] is not None:
+        args += ["-crf", str(settings["crf"] if crf is None else crf)]
+    if settings["preset"] is not None:
+        args += ["-preset", str(settings["preset"] if preset is None else preset)]
+    args += settings.get("extra", [])
+    if settings["pix_fmt"]:
+        args += ["-pix_fmt", settings["pix_fmt"]]
+    if threads:
+        args += ["-threads", str(threads)]
+    return args
+
+def codec_tag_args(profile, output_path):
+    """
+    The -tag:v option the profile needs in output_path's container, if any.
+
+    HEVC in MP4 and MOV is tagged hvc1 so QuickTime and Apple devices play it;
+    other containers keep the muxer's own tag.
+    """
+    tag = ENCODER_PROFILES[profile].get("mp4_tag")
+    if tag and Path(output_path).suffix.lower() in MP4_EXTENSIONS:
+        return ["-tag:v", tag]
+    return []
+
+# Audio codecs the MP4 and MOV muxers accept as they are. Other audio, such as
+# the PCM track of AVI clips, is encoded to AAC when written to those containers.
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac", "opus", "flac"}
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+def stream_copy_args(audio_streams, output_path):
+    """
+    Codec options for the streams passthrough_args maps into output_path.
+
+    Audio is copied unless the output is an MP4 or MOV file that cannot hold one
+    of the codecs, in which case it is encoded to AAC. Data streams such as a
+    timecode track are copied into .mov, the only output container that takes
+    them as they are, and left out elsewhere (passthrough_args only maps them
+    when a data codec is given); the MP4 muxer rebuilds a timecode track from
+    the copied metadata. audio_streams is the VideoProbe field of the same name.
+    """
+    suffix = Path(output_path).suffix.lower()
+    if suffix in MP4_EXTENSIONS and any(s["codec"] not in MP4_AUDIO_CODECS for s in audio_streams):
+        args = ["-c:a", "aac"]
+    else:
+        args = ["-c:a", "copy"]
+    return args + (["-c:d", "copy"] if suffix == ".mov" else [])
+
+def passthrough_input(source, copy_args):
+    """The extra ffmpeg input passthrough_args copies from, or nothing when copy_args is None."""
+    return [] if copy_args is None else ["-i", source]
+
+def passthrough_args(index, copy_args):
+    """
+    ffmpeg output options that map the audio and data streams and the metadata of
+    input number `index` into the output.
+
+    The streams are muxed from the input's packets in the same ffmpeg run that
+    encodes the video, so nothing is decoded twice; copy_args (from
+    stream_copy_args) sets their codecs, and data streams are only mapped when
+    it names a data codec. With copy_args None the output is video only.
+    """
+    if copy_args is None:
+        return []
+    data_map = ["-map", f"{index}:d?"] if "-c:d" in copy_args else []
+    return [
+        "-map", f"{index}:a?", *data_map, *copy_args,
+        "-map_metadata", str(index), "-map_metadata:s:v:0", f"{index}:s:v:0",
+    ]
+
+def _rawvideo_input(frame_size, fps, frames="-"):
+    """ffmpeg options for an input of raw BGR frames of frame_size (width, height), read from stdin by default."""
+    width, height = frame_size
+    return ["-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-framerate", str(fps), "-i", frames]
+
+def _raw_encoder_cmd(output_path, frame_size, fps, video_args=None, source=None, copy_args=None, frames="-"):
+    """
+    ffmpeg command that encodes raw BGR frames (see _rawvideo_input) into output_path.
+
+    With copy_args set, the audio and data streams and the metadata of source
+    are muxed in as well (see passthrough_args).
+    """
+    return [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-y",
+        *_rawvideo_input(frame_size, fps, frames),
+        *passthrough_input(source, copy_args),
+        "-map", "0:v:0",
+        *passthrough_args(1, copy_args),
+        *(video_args or encoder_args()),
+        output_path
+    ]
+
+
+# ffmpeg filters each engine's filtergraphs rely on. Engines missing from the
+# table only use ffmpeg for plain decoding and encoding.
+ENGINE_FILTERS = {
+    "filtergraph": ("format", "split", "crop", "vflip", "vstack", "overlay"),
+    "strip": ("format", "split", "crop", "vstack", "settb", "setpts", "overlay"),
+}
+# Engine to use instead when ffmpeg lacks one of those filters.
+ENGINE_FALLBACK = "stream"
+
+class FFmpegTools:
+    """The ffmpeg and ffprobe binaries found on PATH, with ffmpeg's version, encoders and filters."""
+    __slots__ = ("ffmpeg", "ffprobe", "version", "encoders", "filters")
+
+    def __init__(self, ffmpeg, ffprobe, version, encoders, filters):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version = version
+        self.encoders = frozenset(encoders)
+        self.filters = frozenset(filters)
+
+    def to_dict(self):
+        return {"ffmpeg": self.ffmpeg, "ffprobe": self.ffprobe, "version": self.version,
+                "encoders": sorted(self.encoders), "filters": sorted(self.filters)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["ffmpeg"], data["ffprobe"], data["version"], data["encoders"], data["filters"])
+
+def _ffmpeg_listing(ffmpeg, option):
+    result = subprocess.run([ffmpeg, "-hide_banner", option], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    return result.stdout.splitlines()
+
+def _parse_encoders(lines):
+    """Encoder names from `ffmpeg -encoders`: the second column of the rows below the ------ rule."""
+    names = []
+    in_table = False
+    for line in lines:
+        fields = line.split()
+        if not in_table:
+            in_table = fields[:1] == ["------"]
+        elif len(fields) >= 2:
+            names.append(fields[1])
+    return names
+
+def _parse_filters(lines):
+    """Filter names from `ffmpeg -filters`: rows of flags, name and an A->B style signature."""
+    return [fields[1] for fields in map(str.split, lines) if len(fields) >= 3 and "->" in fields[2]]
+
+def discover_tools(cache_dir=None):
+    """
+    Find ffmpeg and ffprobe on PATH with shutil.which and describe the ffmpeg build.
+
+    The version line and the encoder and filter lists cost three ffmpeg runs, so
+    when cache_dir is given they are cached there keyed by the resolved ffmpeg
+    path, size and mtime; a cache hit spawns nothing. Returns None when either
+    binary is missing or ffmpeg cannot run.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    ffprobe = shutil.which("ffprobe")
+    if not ffmpeg or not ffprobe:
+        return None
+    ffmpeg = os.path.realpath(ffmpeg)
+    stat = os.stat(ffmpeg)
+    cache_path = Path(cache_dir) / "tools_cache.json" if cache_dir else None
+    if cache_path is not None:
+        entry = _load_json_cache(cache_path).get(ffmpeg)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            tools = FFmpegTools.from_dict(entry["tools"])
+            tools.ffprobe = ffprobe
+            return tools
 
-def check_ffmpeg():
-    """Check if ffmpeg is available."""
     try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        subprocess.run(["ffprobe", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except Exception:
+        version = _ffmpeg_listing(ffmpeg, "-version")[0]
+        encoders = _parse_encoders(_ffmpeg_listing(ffmpeg, "-encoders"))
+        filters = _parse_filters(_ffmpeg_listing(ffmpeg, "-filters"))
+    except (OSError, IndexError, subprocess.CalledProcessError):
+        return None
+    tools = FFmpegTools(ffmpeg, ffprobe, version, encoders, filters)
+
+    if cache_path is not None:
+        cache = _load_json_cache(cache_path)
+        cache[ffmpeg] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "tools": tools.to_dict()}
+        _save_json_cache(cache_path, cache)
+    return tools
+
+def check_ffmpeg(cache_dir=None):
+    """Check that ffmpeg and ffprobe are available and return their FFmpegTools."""
+    tools = discover_tools(cache_dir)
+    if tools is None:
         print("Error: ffmpeg and/or ffprobe not found in PATH.")
         sys.exit(1)
+    return tools
+
+def select_supported(args, tools):
+    """
+    Swap the requested encoder profile and engine for supported ones if needed.
+
+    An encoder profile whose codec this ffmpeg build lacks follows its
+    "fallback" chain, and an engine whose filters are missing falls back to the
+    plain streaming engine, with a warning either way. So does the shm engine
+    on Python 3.7, which has no multiprocessing.shared_memory. Updates args in
+    place.
+    """
+    profile = args.encoder
+    while ENCODER_PROFILES[profile]["codec"] not in tools.encoders and "fallback" in ENCODER_PROFILES[profile]:
+        profile = ENCODER_PROFILES[profile]["fallback"]
+    if profile != args.encoder:
+        print(f"⚠️ ffmpeg has no {ENCODER_PROFILES[args.encoder]['codec']} encoder; using the {profile} encoder profile instead of {args.encoder}.")
+        args.encoder = profile
+    missing = [f for f in ENGINE_FILTERS.get(args.engine, ()) if f not in tools.filters]
+    if missing:
+        print(f"⚠️ ffmpeg lacks the {', '.join(missing)} filter(s) the {args.engine} engine needs; using the {ENGINE_FALLBACK} engine instead.")
+        args.engine = ENGINE_FALLBACK
+    if args.engine == "shm" and sys.version_info < (3, 8):
+        print(f"⚠️ The shm engine needs Python 3.8 or newer for multiprocessing.shared_memory; using the {ENGINE_FALLBACK} engine instead.")
+        args.engine = ENGINE_FALLBACK
+
+def default_cache_dir():
+    """Per-user cache directory for probe results and other reusable metadata."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(Path.home(), ".cache")
+    return Path(base) / "bushnell-watermark-remover"
+
+def _load_json_cache(path):
+    """Load a JSON cache file, treating a missing or corrupt file as empty."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_json_cache(path, data):
+    """Atomically replace a JSON cache file so concurrent runs never see a partial write."""
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only or full cache directory only costs us the cache.
+        pass
+
+def _parse_rate(rate):
+    """Parse an ffprobe rational such as '30000/1001' into a float."""
+    if not rate:
+        return 0.0
+    if "/" in rate:
+        num, denom = map(float, rate.split("/"))
+        return num / denom if denom else num
+    return float(rate)
+
+class VideoProbe:
+    """Stream metadata of an input video, gathered with a single ffprobe call."""
+    __slots__ = ("fps", "width", "height", "pix_fmt", "frame_count", "duration", "codec", "audio_streams")
+
+    def __init__(self, fps, width, height, pix_fmt, frame_count, duration, codec, audio_streams):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        self.frame_count = frame_count
+        self.duration = duration
+        self.codec = codec
+        self.audio_streams = audio_streams
+
+    @classmethod
+    def from_ffprobe(cls, info):
+        """Build a probe record from `ffprobe -print_format json -show_streams -show_format` output."""
+        streams = info.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"), None)
+        if video is None:
+            raise ValueError("no video stream found")
+        fps = _parse_rate(video.get("r_frame_rate"))
+        duration = video.get("duration") or info.get("format", {}).get("duration")
+        duration = float(duration) if duration else None
+        frame_count = video.get("nb_frames")
+        if frame_count:
+            frame_count = int(frame_count)
+        elif duration and fps:
+            frame_count = int(round(duration * fps))
+        else:
+            frame_count = None
+        audio_streams = [
+            {
+                "index": s.get("index"),
+                "codec": s.get("codec_name"),
+                "channels": s.get("channels"),
+                "sample_rate": s.get("sample_rate"),
+            }
+            for s in streams if s.get("codec_type") == "audio"
+        ]
+        return cls(fps, int(video["width"]), int(video["height"]), video.get("pix_fmt"),
+                   frame_count, duration, video.get("codec_name"), audio_streams)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+def probe_video(input_path, cache_dir=None):
+    """
+    Probe fps, size, pixel format, frame count, duration, codec and audio streams.
+
+    Runs one `ffprobe -print_format json` call. When cache_dir is given, results
+    are cached there keyed by the absolute path, size and mtime of the input, so
+    re-running over the same clips does not spawn ffprobe again.
+
+    Raises:
+        ValueError: If ffprobe fails or the input has no video stream.
+    """
+    stat = os.stat(input_path)
+    key = os.path.abspath(input_path)
+    cache_path = Path(cache_dir) / "probe_cache.json" if cache_dir else None
+    if cache_path is not None:
+        cache = _load_json_cache(cache_path)
+        entry = cache.get(key)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return VideoProbe.from_dict(entry["probe"])
 
-def get_fps(input_path):
-    """Get the frame rate of the input video using ffprobe."""
     cmd = [
-        "ffprobe", "-v", "0", "-of", "csv=p=0", "-select_streams", "v:0",
-        "-show_entries", "stream=r_frame_rate", input_path
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_streams", "-show_format", input_path
     ]
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    fps_str = result.stdout.strip()
-    if "/" in fps_str:
-        num, denom = map(float, fps_str.split("/"))
-        return num / denom if denom else num
-    return float(fps_str)
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip() or f"ffprobe exited with status {result.returncode}")
+    probe = VideoProbe.from_ffprobe(json.loads(result.stdout))
+
+    if cache_path is not None:
+        # Re-read so entries written by concurrent runs are not lost.
+        cache = _load_json_cache(cache_path)
+        cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "probe": probe.to_dict()}
+        _save_json_cache(cache_path, cache)
+    return probe
 
-def extract_frames(input_path, tmpdir):
-    """Extract frames from video using ffmpeg."""
+def extract_frames(input_path, tmpdir, temp_format="png", frame_size=None):
+    """
+    Extract frames from video using ffmpeg.
+
+    Image formats are written by ffmpeg directly. For "npy", ffmpeg decodes to raw
+    BGR on a pipe and each frame is saved with NumPy; frame_size gives its
+    (width, height).
+    """
     os.makedirs(tmpdir, exist_ok=True)
+    if temp_format != "npy":
+        cmd = [
+            "ffmpeg", "-loglevel", "error", "-i", input_path,
+            *TEMP_FORMATS[temp_format]["ffmpeg"],
+            f"{tmpdir}/frame_%05d{TEMP_FORMATS[temp_format]['ext']}"
+        ]
+        subprocess.run(cmd, check=True)
+        return
+
+    import numpy as np
+    width, height = frame_size
     cmd = [
-        "ffmpeg", "-loglevel", "error", "-i", input_path,
-        f"{tmpdir}/frame_%05d.png"
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-i", input_path,
+        "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
     ]
-    subprocess.run(cmd, check=True)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    decoder = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        index = 1
+        while _read_exact(decoder.stdout, frame) == frame.nbytes:
+            np.save(os.path.join(tmpdir, f"frame_{index:05d}.npy"), frame)
+            index += 1
+    finally:
+        decoder.stdout.close()
+        decoder.wait()
+    if decoder.returncode != 0:
+        raise subprocess.CalledProcessError(decoder.returncode, cmd)
+
+def read_temp_frame(path, temp_format="png"):
+    """Load an intermediate frame as a BGR array, or return None if it cannot be read."""
+    if temp_format == "npy":
+        import numpy as np
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+    import cv2
+    return cv2.imread(path)
+
+def write_temp_frame(path, frame, temp_format="png"):
+    """
+    Write an intermediate frame back in the given temp format.
+
+    The frame is written under a tmp_ name next to path and renamed over it, so
+    a process killed mid-write leaves the previous frame intact rather than a
+    truncated file.
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f"tmp_{name}")
+    if temp_format == "npy":
+        import numpy as np
+        np.save(tmp_path, frame)
+    else:
+        import cv2
+        if not cv2.imwrite(tmp_path, frame, TEMP_FORMATS[temp_format]["imwrite"]):
+            raise OSError(f"could not write {tmp_path}")
+    os.replace(tmp_path, path)
 
-def patch_frame(fname, input_dir, patch_width, patch_height, patch_x, patch_y, mirror_height, mirror_offset):
+def sampled_hash(path, sample_size=1 << 20, samples=4):
+    """
+    Fast content fingerprint of a file from its size and a few evenly spaced samples.
+
+    Reads at most samples * sample_size bytes, so hashing a multi-gigabyte clip
+    costs a few milliseconds; files smaller than that are hashed in full.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    with open(path, "rb") as f:
+        if size <= samples * sample_size:
+            digest.update(f.read())
+        else:
+            for i in range(samples):
+                f.seek((size - sample_size) * i // (samples - 1))
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+class OutputCache:
+    """
+    Content-addressed cache of cleaned outputs.
+
+    Entries are keyed by a sampled hash of the input plus the patch geometry and
+    encoder settings, and stored as hardlinks to the outputs (copies when the
+    cache lives on another filesystem). index.json tracks sizes and last use so
+    the least recently used entries are evicted once the cache exceeds max_bytes.
+    """
+    INDEX = "index.json"
+    # Batch mode finishes clips on several threads at once.
+    _lock = threading.Lock()
+
+    def __init__(self, cache_dir, max_bytes):
+        self.root = Path(cache_dir) / "outputs"
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(input_path, geometry, video_args, copy_args=None):
+        settings = json.dumps({"input": sampled_hash(input_path), "geometry": repr(geometry), "video_args": video_args, "copy_args": copy_args})
+        return hashlib.blake2b(settings.encode(), digest_size=20).hexdigest()
+
+    def lookup(self, key, output_path):
+        """Place the cached output for key at output_path. Returns True on a cache hit."""
+        with self._lock:
+            index = _load_json_cache(self.root / self.INDEX)
+            entry = index.get(key)
+            if entry is None:
+                return False
+            cached = self.root / entry["file"]
+            if not cached.is_file():
+                del index[key]
+                _save_json_cache(self.root / self.INDEX, index)
+                return False
+            entry["last_used"] = time.time()
+            _save_json_cache(self.root / self.INDEX, index)
+        output_path = Path(output_path)
+        if output_path.exists():
+            if os.path.samefile(cached, output_path):
+                return True
+            output_path.unlink()
+        _link_or_copy(cached, output_path)
+        return True
+
+    def store(self, key, output_path):
+        """Add output_path to the cache under key, then evict least recently used entries."""
+        cached = self.root / f"{key}{Path(output_path).suffix}"
+        with self._lock:
+            try:
+                self.root.mkdir(parents=True, exist_ok=True)
+                if cached.exists():
+                    cached.unlink()
+                _link_or_copy(output_path, cached)
+            except OSError as e:
+                print(f"⚠️ Could not add {output_path} to the output cache: {e}")
+                return
+            index = _load_json_cache(self.root / self.INDEX)
+            index[key] = {"file": cached.name, "size": cached.stat().st_size, "last_used": time.time()}
+            total = sum(entry["size"] for entry in index.values())
+            for old_key, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.max_bytes or old_key == key:
+                    break
+                try:
+                    (self.root / entry["file"]).unlink()
+                except FileNotFoundError:
+                    pass
+                total -= entry["size"]
+                del index[old_key]
+            _save_json_cache(self.root / self.INDEX, index)
+
+def _link_or_copy(src, dst):
+    """Hardlink src to dst, copying instead when they are on different filesystems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class PatchGeometry:
+    """
+    Watermark patch geometry resolved against a concrete frame size.
+
+    Built once per resolution from the probed width and height; every row and
+    column range patch_batch needs is precomputed as a slice object, so the
+    per-frame work is just the two slice assignments. Raises ValueError up front
+    when the watermark area or either source region falls outside the frame.
+
+    Args:
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+        patch_width (int): Width of the watermark area (default 110).
+        patch_height (int): Total height of the watermark area (default 110).
+        patch_x (int): X-coordinate of the bottom-left corner of the watermark (default 0).
+        patch_y (int): Y-coordinate of the bottom-left corner of the watermark,
+                       measured from the bottom of the frame (default 0).
+        mirror_height (int): Height of the content to be mirrored for the upper part
+                             of the patch (default 54).
+        mirror_offset (int): Vertical offset *above* the watermark area from where
+                             the mirrored content is sourced (default 56).
+                             This means the source for mirroring starts `mirror_offset` pixels
+                             above the top of the `patch_height` area defined by `patch_y`.
+    """
+    __slots__ = (
+        "width", "height",
+        "patch_width", "patch_height", "patch_x", "patch_y", "mirror_height", "mirror_offset",
+        "wm_y_start", "wm_y_end", "mirror_src_y_start", "adj_src_y_start", "repatch_safe",
+        "wm_rows", "wm_cols", "mirror_dst_rows", "mirror_src_rows", "adj_rows", "adj_src_cols",
+    )
+
+    def __init__(self, width, height, patch_width=110, patch_height=110, patch_x=0, patch_y=0, mirror_height=54, mirror_offset=56):
+        self.width = width
+        self.height = height
+        self.patch_width = patch_width
+        self.patch_height = patch_height
+        self.patch_x = patch_x
+        self.patch_y = patch_y
+        self.mirror_height = mirror_height
+        self.mirror_offset = mirror_offset
+
+        # Watermark area to be replaced (bottom-left origin, patch_y from bottom of frame)
+        # wm_y_start is the top Y of the patch area, wm_y_end is the bottom Y.
+        wm_y_start = height - (patch_y + patch_height) # Top of the watermark area
+        wm_y_end = height - patch_y                  # Bottom of the watermark area (e.g. bottom of frame if patch_y=0)
+        wm_x_start = patch_x                         # Left of the watermark area
+        wm_x_end = patch_x + patch_width             # Right of the watermark area
+
+        # Source for the upper, mirrored part of the patch
+        # This content is taken from directly above the watermark area.
+        # mirror_offset defines how many pixels *above* the watermark's top edge
+        # the source for the mirrored content begins.
+        mirror_src_y_start = wm_y_start - mirror_offset # Top of the source region for mirroring
+        mirror_src_y_end = wm_y_start - mirror_offset + mirror_height # Bottom of the source region for mirroring
+
+        # Source for the lower, adjacent part of the patch
+        # This content is typically taken from the area immediately to the right
+        # of the lower part of the watermark (i.e., within the white info bar).
+        # Its height is (patch_height - mirror_height), which is 110 - 54 = 56 pixels by default.
+        adjacent_patch_height = patch_height - mirror_height
+        # Y-coordinates for the source of this adjacent patch should align with the lower part of the watermark area.
+        adj_src_y_start = wm_y_end - adjacent_patch_height # Top of adjacent source (aligns with top of where it will go)
+        adj_src_y_end = wm_y_end                         # Bottom of adjacent source (aligns with bottom of patch area)
+        adj_src_x_start = patch_x + patch_width          # Start immediately to the right of the watermark area
+        adj_src_x_end = patch_x + 2 * patch_width      # End patch_width pixels further to the right
+
+        if not 0 <= wm_y_start < wm_y_end <= height or not 0 <= wm_x_start < wm_x_end <= width:
+            raise ValueError(f"watermark area ({patch_width}x{patch_height} at X:{patch_x}, Y:{patch_y}) does not fit inside a {width}x{height} frame")
+        if not 0 < mirror_height < patch_height:
+            raise ValueError(f"mirror height {mirror_height} must be between 1 and patch height - 1 ({patch_height - 1})")
+        if not 0 <= mirror_src_y_start < mirror_src_y_end <= height:
+            raise ValueError(f"mirror source rows {mirror_src_y_start}..{mirror_src_y_end} fall outside a {width}x{height} frame")
+        if not 0 <= adj_src_x_start < adj_src_x_end <= width:
+            raise ValueError(f"adjacent source columns {adj_src_x_start}..{adj_src_x_end} fall outside a {width}x{height} frame")
+
+        self.wm_y_start = wm_y_start
+        self.wm_y_end = wm_y_end
+        self.mirror_src_y_start = mirror_src_y_start
+        self.adj_src_y_start = adj_src_y_start
+        # Patching reads only pixels it never writes unless the mirror source
+        # reaches down into the watermark (mirror_offset < mirror_height); only
+        # then does patching a frame a second time change it.
+        self.repatch_safe = mirror_src_y_end <= wm_y_start
+        self.wm_rows = slice(wm_y_start, wm_y_end)
+        self.wm_cols = slice(wm_x_start, wm_x_end)
+        self.mirror_dst_rows = slice(wm_y_start, wm_y_start + mirror_height)
+        # Reversed slice over the mirror source rows: indexing with it yields the
+        # vertically flipped view directly. The stop is None when the flip runs
+        # down to row 0, since -1 would mean "the last row".
+        self.mirror_src_rows = slice(mirror_src_y_end - 1, mirror_src_y_start - 1 if mirror_src_y_start > 0 else None, -1)
+        self.adj_rows = slice(adj_src_y_start, adj_src_y_end)
+        self.adj_src_cols = slice(adj_src_x_start, adj_src_x_end)
+
+    @classmethod
+    def from_args(cls, args, width, height):
+        """Build the geometry from parsed --patch-*/--mirror-* CLI arguments."""
+        return cls(width, height, args.patch_width, args.patch_height, args.patch_x, args.patch_y, args.mirror_height, args.mirror_offset)
+
+    def sources_filter(self):
+        """
+        ffmpeg filter chain that cuts the patch's two sources out of a bgr24 frame.
+
+        The mirror source is stacked above the adjacent source, giving a
+        patch_width x patch_height image that becomes the patch once its top
+        mirror_height rows are flipped vertically.
+        """
+        adjacent_patch_height = self.patch_height - self.mirror_height
+        return (
+            "split=2[mirror_src][adj_src];"
+            f"[mirror_src]crop={self.patch_width}:{self.mirror_height}:{self.patch_x}:{self.mirror_src_y_start}[mirror];"
+            f"[adj_src]crop={self.patch_width}:{adjacent_patch_height}:{self.patch_x + self.patch_width}:{self.adj_src_y_start}[adjacent];"
+            "[mirror][adjacent]vstack"
+        )
+
+    def __repr__(self):
+        return (f"PatchGeometry({self.width}x{self.height}, Patch(W:{self.patch_width}, H:{self.patch_height}, "
+                f"X:{self.patch_x}, Y:{self.patch_y}), Mirror(H:{self.mirror_height}, Offset:{self.mirror_offset}))")
+
+# Watermark detection. HSV ranges use OpenCV's scale (hue 0-179): the orange
+# logo, and the white info bar. A pixel belongs to the overlay only if it is in
+# range in at least DETECT_PERSISTENCE of the sampled frames; the scene moves,
+# the overlay does not.
+DETECT_SAMPLES = 10
+DETECT_PERSISTENCE = 0.8
+LOGO_HSV_RANGE = ((5, 120, 150), (25, 255, 255))
+INFO_BAR_HSV_RANGE = ((0, 0, 190), (179, 60, 255))
+# Share of a row's pixels that must be white for the row to be part of the info
+# bar; its date and time text keeps this well below 1.
+INFO_BAR_MIN_FILL = 0.4
+# Pixels added around the detected logo to cover its antialiased edge.
+DETECT_MARGIN = 2
+# Gap between the mirror source and the top of the patch, as in the defaults
+# (mirror offset 56 for a 54-pixel mirror).
+MIRROR_GAP = 2
+
+def sample_frames(input_path, width, height, duration=None, count=DETECT_SAMPLES):
+    """
+    Decode up to count frames spread evenly over the clip as an (n, height, width, 3) BGR array.
+
+    One ffmpeg process opens the input once per sample, each with its own -ss,
+    and keeps the first frame after every seek, so only the GOPs around the
+    sample points are decoded rather than the whole clip.
+    """
+    import numpy as np
+    times = [duration * (i + 0.5) / count for i in range(count)] if duration else [0.0]
+    cmd = ["ffmpeg", "-loglevel", "error", "-nostdin"]
+    for t in times:
+        cmd += ["-ss", f"{t:.3f}", "-i", input_path]
+    graph = "".join(f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS[f{i}];" for i in range(len(times)))
+    graph += "".join(f"[f{i}]" for i in range(len(times))) + f"concat=n={len(times)}:v=1:a=0[out]"
+    cmd += ["-filter_complex", graph, "-map", "[out]", "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode(errors="replace").strip() or f"ffmpeg exited with status {result.returncode}")
+    frame_bytes = width * height * 3
+    n = len(result.stdout) // frame_bytes
+    return np.frombuffer(result.stdout, dtype=np.uint8, count=n * frame_bytes).reshape(n, height, width, 3)
+
+def _persistent_mask(hsv, hsv_range, min_frames):
+    """Pixels inside hsv_range in at least min_frames of the (n, h, w, 3) HSV stack."""
+    import cv2
+    import numpy as np
+    n, h, w, _ = hsv.shape
+    lower, upper = (np.array(bound, dtype=np.uint8) for bound in hsv_range)
+    hits = cv2.inRange(hsv.reshape(n * h, w, 3), lower, upper).reshape(n, h, w)
+    return np.count_nonzero(hits, axis=0) >= min_frames
+
+def detect_geometry(frames):
+    """
+    Locate the orange logo and the white info bar in sampled frames and derive the patch geometry.
+
+    Both are found by thresholding all frames at once in HSV and keeping the
+    pixels that match in most of them. The logo's bounding box in the bottom
+    half of the frame, grown by DETECT_MARGIN, becomes the watermark area; the
+    top of the info bar splits it into the mirrored upper part and the lower
+    part filled from the bar beside the logo.
+
+    Raises:
+        ValueError: If no logo or no info bar under it is found, or the derived
+            geometry does not fit the frame.
+    """
+    import cv2
+    import numpy as np
+    n, height, width, _ = frames.shape
+    if n == 0:
+        raise ValueError("no frames could be decoded")
+    min_frames = max(1, int(np.ceil(DETECT_PERSISTENCE * n)))
+    top = height // 2
+    bottom = frames[:, top:]
+    hsv = cv2.cvtColor(bottom.reshape(-1, width, 3), cv2.COLOR_BGR2HSV).reshape(bottom.shape)
+
+    logo = _persistent_mask(hsv, LOGO_HSV_RANGE, min_frames)
+    row_counts = logo.sum(axis=1)
+    col_counts = logo.sum(axis=0)
+    if not row_counts.any():
+        raise ValueError("no orange logo found in the bottom half of the frame")
+    # Rows and columns at least half as full as the fullest one, which drops
+    # stray orange pixels of the scene around the logo.
+    rows = np.flatnonzero(row_counts >= row_counts.max() / 2)
+    cols = np.flatnonzero(col_counts >= col_counts.max() / 2)
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    if logo[y0:y1, x0:x1].mean() < 0.5:
+        raise ValueError(f"orange area at X:{x0}, Y:{top + y0} is not a solid logo")
+
+    bar_rows = _persistent_mask(hsv, INFO_BAR_HSV_RANGE, min_frames).mean(axis=1) >= INFO_BAR_MIN_FILL
+    if not bar_rows[y1 - 1]:
+        raise ValueError("no white info bar found along the bottom of the logo")
+    bar_top = y1 - 1
+    while bar_top > y0 and bar_rows[bar_top - 1]:
+        bar_top -= 1
+
+    y0 = max(0, y0 - DETECT_MARGIN)
+    x0 = max(0, x0 - DETECT_MARGIN)
+    y1 = min(bottom.shape[1], y1 + DETECT_MARGIN)
+    x1 = min(width, x1 + DETECT_MARGIN)
+    mirror_height = bar_top - y0
+    return PatchGeometry(
+        width, height, patch_width=int(x1 - x0), patch_height=int(y1 - y0),
+        patch_x=int(x0), patch_y=int(height - top - y1),
+        mirror_height=int(mirror_height), mirror_offset=int(mirror_height + MIRROR_GAP),
+    )
+
+def detected_geometry(input_path, width, height, duration=None, cache_dir=None):
+    """
+    Detect the watermark geometry of a clip, cached per resolution.
+
+    Cameras of one model stamp the same overlay at a given resolution, so
+    when cache_dir is given the geometry detected for the first clip of a
+    width x height is reused for the others without decoding anything.
+    Returns (geometry, cached).
+
+    Raises:
+        ValueError: If the frames cannot be decoded or detection fails.
+    """
+    cache_path = Path(cache_dir) / "geometry_cache.json" if cache_dir else None
+    key = f"{width}x{height}"
+    if cache_path is not None:
+        entry = _load_json_cache(cache_path).get(key)
+        if entry:
+            return PatchGeometry(width, height, **entry), True
+
+    geometry = detect_geometry(sample_frames(input_path, width, height, duration))
+    if cache_path is not None:
+        cache = _load_json_cache(cache_path)
+        cache[key] = {name: getattr(geometry, name) for name in ("patch_width", "patch_height", "patch_x", "patch_y", "mirror_height", "mirror_offset")}
+        _save_json_cache(cache_path, cache)
+    return geometry, False
+
+def patch_frame(fname, input_dir, geometry, temp_format="png"):
     """
     Patches a single frame to remove a Bushnell trail camera watermark.
 
@@ -71,145 +833,511 @@ def patch_frame(fname, input_dir, patch_width, patch_height, patch_x, patch_y, m
     Args:
         fname (str): Filename of the frame to patch.
         input_dir (str): Directory containing the frame.
-        patch_width (int): Width of the watermark area (default 110).
-        patch_height (int): Total height of the watermark area (default 110).
-        patch_x (int): X-coordinate of the bottom-left corner of the watermark (default 0).
-        patch_y (int): Y-coordinate of the bottom-left corner of the watermark,
-                       measured from the bottom of the frame (default 0).
-        mirror_height (int): Height of the content to be mirrored for the upper part
-                             of the patch (default 54).
-        mirror_offset (int): Vertical offset *above* the watermark area from where
-                             the mirrored content is sourced (default 56).
-                             This means the source for mirroring starts `mirror_offset` pixels
-                             above the top of the `patch_height` area defined by `patch_y`.
+        geometry (PatchGeometry): Patch geometry for the frame's resolution.
+        temp_format (str): Intermediate frame format, a key of TEMP_FORMATS (default "png").
 
     Returns:
         bool: True if patching was successful, False otherwise.
     """
     path = os.path.join(input_dir, fname)
-    frame = cv2.imread(path)
+    frame = read_temp_frame(path, temp_format)
     if frame is None:
         return False
-    height, width, _ = frame.shape
-    if height < patch_height or width < patch_width + patch_x:
+    if not patch_array(frame, geometry):
         return False
-    
-    # Watermark area to be replaced (bottom-left origin, patch_y from bottom of frame)
-    # wm_y_start is the top Y of the patch area, wm_y_end is the bottom Y.
-    wm_y_start = height - (patch_y + patch_height) # Top of the watermark area
-    wm_y_end = height - patch_y                  # Bottom of the watermark area (e.g. bottom of frame if patch_y=0)
-    wm_x_start = patch_x                         # Left of the watermark area
-    wm_x_end = patch_x + patch_width             # Right of the watermark area
-
-    # Source for the upper, mirrored part of the patch
-    # This content is taken from directly above the watermark area.
-    # mirror_offset defines how many pixels *above* the watermark's top edge
-    # the source for the mirrored content begins.
-    mirror_src_y_start = wm_y_start - mirror_offset # Top of the source region for mirroring
-    mirror_src_y_end = wm_y_start - mirror_offset + mirror_height # Bottom of the source region for mirroring
-    mirror_src_x_start = patch_x # Source X is aligned with watermark X
-    mirror_src_x_end = patch_x + patch_width
-    
-    # Source for the lower, adjacent part of the patch
-    # This content is typically taken from the area immediately to the right
-    # of the lower part of the watermark (i.e., within the white info bar).
-    # Its height is (patch_height - mirror_height), which is 110 - 54 = 56 pixels by default.
-    adjacent_patch_height = patch_height - mirror_height
-    # Y-coordinates for the source of this adjacent patch should align with the lower part of the watermark area.
-    adj_src_y_start = wm_y_end - adjacent_patch_height # Top of adjacent source (aligns with top of where it will go)
-    adj_src_y_end = wm_y_end                         # Bottom of adjacent source (aligns with bottom of patch area)
-    adj_src_x_start = patch_x + patch_width          # Start immediately to the right of the watermark area
-    adj_src_x_end = patch_x + 2 * patch_width      # End patch_width pixels further to the right
-
-    # Defensive checks for coordinates (simple version)
-    if not (0 <= mirror_src_y_start < mirror_src_y_end <= height and \
-            0 <= mirror_src_x_start < mirror_src_x_end <= width and \
-            0 <= adj_src_y_start < adj_src_y_end <= height and \
-            0 <= adj_src_x_start < adj_src_x_end <= width and \
-            0 <= wm_y_start < wm_y_end <= height and \
-            0 <= wm_x_start < wm_x_end <= width):
+    try:
+        write_temp_frame(path, frame, temp_format)
+    except OSError:
         return False
+    return True
+
+def patch_array(frame, geometry):
+    """
+    Patches a decoded BGR frame (H x W x 3 uint8 array) in place.
 
-    mirrored_content = frame[mirror_src_y_start:mirror_src_y_end, mirror_src_x_start:mirror_src_x_end]
-    mirrored_content_flipped = cv2.flip(mirrored_content, 0)
+    This is the pixel work behind patch_frame, usable on frames that never touch
+    the disk. See patch_frame for the patching strategy.
 
-    # Ensure flipped mirrored content has the correct height for vconcat
-    if mirrored_content_flipped.shape[0] != mirror_height:
-        return False
+    Returns:
+        bool: True if patching was successful, False otherwise.
+    """
+    import numpy as np
+    return patch_batch(frame[np.newaxis], geometry)
 
-    adjacent_content = frame[adj_src_y_start:adj_src_y_end, adj_src_x_start:adj_src_x_end]
-    
-    # Ensure adjacent content has correct height
-    if adjacent_content.shape[0] != adjacent_patch_height:
-        return False
+def patch_batch(frames, geometry):
+    """
+    Patches a block of decoded BGR frames (N x H x W x 3 uint8 array) in place.
+
+    All frames share the same geometry, so the whole block is patched with two
+    vectorized slice assignments. See patch_frame for the patching strategy.
 
-    # Combine them
-    if mirrored_content_flipped.shape[1] != patch_width or adjacent_content.shape[1] != patch_width:
+    Returns:
+        bool: True if patching was successful, False if the frames do not have
+        the resolution the geometry was built for.
+    """
+    if frames.shape[1] != geometry.height or frames.shape[2] != geometry.width:
         return False
+    # Upper part: the mirror source flipped vertically, taken as a reversed view
+    # so no intermediate copy is made.
+    frames[:, geometry.mirror_dst_rows, geometry.wm_cols] = frames[:, geometry.mirror_src_rows, geometry.wm_cols]
+    # Lower part: the adjacent source copied straight across.
+    frames[:, geometry.adj_rows, geometry.wm_cols] = frames[:, geometry.adj_rows, geometry.adj_src_cols]
+    return True
+
+# Upper edges of the patch latency histogram buckets in milliseconds; a last,
+# open-ended bucket counts everything slower.
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
 
+class RunReport:
+    """
+    Per-stage instrumentation of one clip, written out with --report.
+
+    stage() times a block with wall time and CPU time from os.times(), split
+    into this process (including its threads) and its children: ffmpeg and pool
+    workers, counted once they have exited, so a pool shared across a batch is
+    only counted in the clip that was running when the batch ended. The block
+    fills in frames and bytes read and written through the dict it yields.
+    Per-frame patch latencies are kept as a histogram per worker. Clips of a
+    batch run side by side in one process, so their CPU times overlap.
+    """
+    def __init__(self):
+        self.stages = []
+        self.workers = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        info = {"name": name, "frames": None, "bytes_read": None, "bytes_written": None}
+        wall_start = time.perf_counter()
+        cpu_start = os.times()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = os.times()
+            info["wall_s"] = wall
+            info["cpu_s"] = (cpu.user - cpu_start.user) + (cpu.system - cpu_start.system)
+            info["children_cpu_s"] = (cpu.children_user - cpu_start.children_user) + (cpu.children_system - cpu_start.children_system)
+            info["fps"] = info["frames"] / wall if info["frames"] and wall > 0 else None
+            self.stages.append(info)
+
+    def add_latencies(self, worker, latencies):
+        """Add per-frame patch times in seconds measured by one worker."""
+        entry = self.workers.setdefault(worker, {"frames": 0, "total_s": 0.0, "max_s": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)})
+        for seconds in latencies:
+            entry["frames"] += 1
+            entry["total_s"] += seconds
+            entry["max_s"] = max(entry["max_s"], seconds)
+            entry["histogram"][bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+
+    def summary(self):
+        parts = []
+        for stage in self.stages:
+            fps = f", {stage['fps']:.1f} fps" if stage["fps"] else ""
+            parts.append(f"{stage['name']} {stage['wall_s']:.2f}s{fps}")
+        return "⏱️  Stages: " + " | ".join(parts)
+
+    def to_dict(self):
+        workers = {
+            worker: {
+                "frames": entry["frames"],
+                "mean_ms": entry["total_s"] / entry["frames"] * 1000 if entry["frames"] else None,
+                "max_ms": entry["max_s"] * 1000,
+                "histogram": entry["histogram"],
+            }
+            for worker, entry in sorted(self.workers.items())
+        }
+        return {
+            "stages": self.stages,
+            "patch_latency": {"bucket_upper_ms": list(LATENCY_BUCKETS_MS), "workers": workers},
+        }
+
+def write_report(path, clips, failures=()):
+    """Write the --report JSON: machine details, then the per-clip stats and stage reports."""
+    data = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "argv": sys.argv,
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "clips": clips,
+        "failures": [{"input": str(input_path), "reason": reason} for input_path, reason in failures],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"📝 Report written to {path}")
+
+def _usage(directory, pattern):
+    """(file count, total bytes) of the files in directory matching pattern."""
+    sizes = [p.stat().st_size for p in Path(directory).glob(pattern)]
+    return len(sizes), sum(sizes)
+
+def _file_bytes(path):
     try:
-        patch = cv2.vconcat([mirrored_content_flipped, adjacent_content])
-    except cv2.error as e:
-        return False
+        return os.path.getsize(path)
+    except OSError:
+        return 0
 
-    if patch.shape[0] != patch_height or patch.shape[1] != patch_width:
-        return False
+class Checkpoint:
+    """
+    Resumable-run manifest kept in a temporary directory.
 
-    frame[wm_y_start:wm_y_end, wm_x_start:wm_x_end] = patch
-    cv2.imwrite(path, frame)
-    return True
+    manifest.json records which stages have finished for a given input and set
+    of parameters, and patched frames (or frame ranges) are appended to patched.log as they
+    complete, so progress survives the process being killed at any point. A
+    manifest written for a different input or different parameters is discarded
+    together with the intermediate files it describes.
+    """
+    MANIFEST = "manifest.json"
+    PATCH_LOG = "patched.log"
+    # Intermediate files the manifest vouches for; removed when it is discarded.
+    ARTIFACTS = ("frame_*", "tmp_frame_*", "frames.raw", "segment_*.mkv", "encoded_*.mkv", PATCH_LOG)
+
+    def __init__(self, workdir, key, resume=True):
+        self.workdir = Path(workdir)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        data = _load_json_cache(self.workdir / self.MANIFEST) if resume else {}
+        self.resumed = data.get("key") == key
+        if self.resumed:
+            self.data = data
+            try:
+                with open(self.workdir / self.PATCH_LOG, "r", encoding="utf-8") as f:
+                    self.patched = {line.strip() for line in f if line.strip()}
+            except OSError:
+                self.patched = set()
+        else:
+            for pattern in self.ARTIFACTS:
+                for path in self.workdir.glob(pattern):
+                    path.unlink()
+            self.data = {"key": key, "stages": [], "segments": []}
+            self.patched = set()
+            self._save()
+        self._patch_log = None
+
+    def _save(self):
+        _save_json_cache(self.workdir / self.MANIFEST, self.data)
+
+    def is_done(self, stage):
+        return stage in self.data["stages"]
+
+    def mark_done(self, stage, **info):
+        """Record that stage finished, with optional extra info stored in the manifest."""
+        self.data["stages"].append(stage)
+        self.data.update(info)
+        self._save()
+
+    def segment_encoded(self, name):
+        return name in self.data["segments"]
+
+    def mark_segment_encoded(self, name):
+        self.data["segments"].append(name)
+        self._save()
+
+    def mark_patched(self, *fnames):
+        """Append patched frames to the log, flushed so they survive a crash."""
+        if self._patch_log is None:
+            self._patch_log = open(self.workdir / self.PATCH_LOG, "a", encoding="utf-8")
+        self._patch_log.write("".join(fname + "\n" for fname in fnames))
+        self._patch_log.flush()
+        self.patched.update(fnames)
+
+    def close(self):
+        if self._patch_log is not None:
+            self._patch_log.close()
+            self._patch_log = None
+
+# Patch geometry of the current worker process, set once by the pool initializer.
+_worker_geometry = None
+
+# Directory for --profile output, or None when profiling is off. Set by profiling().
+_profile_dir = None
+# The run's own profiler while profiling() is active; forked workers inherit it.
+_parent_profiler = None
+# Profilers of pool threads in this process, merged by profiling() at the end.
+_thread_profilers = []
+
+def _start_worker_profile(profile_dir):
+    """
+    Pool initializer: profile this worker for the rest of its life if profile_dir is set.
 
-def _global_patch_frame_wrapper(fname, input_dir, patch_width, patch_height, patch_x, patch_y, mirror_height, mirror_offset):
+    A worker process dumps its stats into profile_dir when it exits, through
+    multiprocessing's exit finalizers; a forked worker first stops the parent's
+    profiler it inherited. Before Python 3.12 cProfile only sees the thread it
+    was enabled on, so a pool thread gets its own profiler, kept in this process
+    and merged directly. From 3.12 cProfile runs on sys.monitoring, which allows
+    one active profiler per process and lets the parent's see every thread.
+    """
+    if profile_dir is None:
+        return
+    is_thread = threading.current_thread() is not threading.main_thread()
+    if is_thread and sys.version_info >= (3, 12):
+        return
+    if not is_thread and _parent_profiler is not None:
+        _parent_profiler.disable()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    if not is_thread:
+        path = os.path.join(profile_dir, f"worker_{os.getpid()}.prof")
+        multiprocessing.util.Finalize(None, profiler.dump_stats, args=(path,), exitpriority=10)
+    else:
+        _thread_profilers.append(profiler)
+
+@contextlib.contextmanager
+def profiling(profile_dir):
+    """
+    Profile the enclosed run, parent and patch workers alike, into profile_dir.
+
+    The parent's profile covers probing, extraction, dispatch and encoding, and
+    every pool started meanwhile profiles its workers' share of the calls. On
+    exit everything is merged with pstats into merged.prof, and a report sorted
+    by cumulative and by own time is written to profile.txt.
+    """
+    global _profile_dir, _parent_profiler
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    for stale in profile_dir.glob("worker_*.prof"):
+        stale.unlink()
+    _profile_dir = str(profile_dir.resolve())
+    profiler = _parent_profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_dir = _parent_profiler = None
+        profiler.dump_stats(profile_dir / "parent.prof")
+        worker_files = sorted(profile_dir.glob("worker_*.prof"))
+        with open(profile_dir / "profile.txt", "w", encoding="utf-8") as f:
+            stats = pstats.Stats(profiler, stream=f)
+            for path in worker_files:
+                stats.add(str(path))
+            for thread_profiler in _thread_profilers:
+                stats.add(thread_profiler)
+            f.write(f"Merged profile of the parent, {len(worker_files)} worker process(es) and {len(_thread_profilers)} worker thread(s)\n")
+            stats.sort_stats("cumulative").print_stats(40)
+            stats.sort_stats("tottime").print_stats(40)
+        stats.dump_stats(profile_dir / "merged.prof")
+        _thread_profilers.clear()
+        print(f"📈 Profile written to {profile_dir / 'profile.txt'} (merged stats: {profile_dir / 'merged.prof'})")
+
+def _init_patch_worker(geometry, profile_dir=None):
+    """Pool initializer: receive the patch geometry once per worker process."""
+    global _worker_geometry
+    _worker_geometry = geometry
+    _start_worker_profile(profile_dir)
+
+def _worker_id():
+    """Name of the calling worker for latency reports: the process id, plus the thread name for pool threads."""
+    if threading.current_thread() is threading.main_thread():
+        return str(os.getpid())
+    return f"{os.getpid()}:{threading.current_thread().name}"
+
+def _global_patch_frame_wrapper(fname, input_dir, geometry=None, temp_format="png"):
     """
     Top-level wrapper for patch_frame to be used with multiprocessing.
-    All arguments must be picklable.
+    All arguments must be picklable. geometry defaults to the one the pool
+    initializer installed; a pool shared between clips passes it per task.
+    Returns (success, worker id, seconds spent on the frame).
     """
-    return patch_frame(fname, input_dir, patch_width, patch_height, patch_x, patch_y, mirror_height, mirror_offset)
+    start = time.perf_counter()
+    ok = patch_frame(fname, input_dir, geometry or _worker_geometry, temp_format)
+    return ok, _worker_id(), time.perf_counter() - start
 
-def patch_frames(tmpdir, patch_width, patch_height, patch_x, patch_y, mirror_height, mirror_offset, n_jobs):
-    frame_files = sorted([f for f in os.listdir(tmpdir) if f.endswith(".png")])
+def _global_patch_chunk_wrapper(fnames, input_dir, geometry=None, temp_format="png"):
+    """
+    Patch a chunk of frames in one task.
+
+    Same arguments as _global_patch_frame_wrapper, with a list of frame names.
+    Returns (names that failed, worker id, seconds spent on each frame).
+    """
+    geometry = geometry or _worker_geometry
+    failed = []
+    latencies = []
+    for fname in fnames:
+        start = time.perf_counter()
+        if not patch_frame(fname, input_dir, geometry, temp_format):
+            failed.append(fname)
+        latencies.append(time.perf_counter() - start)
+    return failed, _worker_id(), latencies
+
+def _patch_pool(geometry, n_jobs, executor=None):
+    """
+    Return (pool context, extra task kwargs) for patching frames with geometry.
+
+    Without a shared executor a dedicated pool is created and the geometry
+    travels to each worker once through the pool initializer. A shared pool
+    serves clips of different resolutions, so each task carries its geometry.
+    """
+    if executor is None:
+        return ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_patch_worker, initargs=(geometry, _profile_dir)), {}
+    return contextlib.nullcontext(executor), {"geometry": geometry}
+
+# Parallel efficiency (speedup over one thread divided by the worker count) that
+# threads must reach during --workers auto calibration to be kept over processes.
+THREAD_EFFICIENCY_THRESHOLD = 0.6
+
+# Upper bound on frames per patch task, so progress and the checkpoint log
+# still advance steadily on very long clips.
+MAX_CHUNK_FRAMES = 256
+
+def _chunk_size(n_frames, n_jobs):
+    """Frames per patch task: about four tasks per worker, at most MAX_CHUNK_FRAMES."""
+    return max(1, min(MAX_CHUNK_FRAMES, -(-n_frames // (4 * max(1, n_jobs)))))
+
+def _calibrate_workers(frame_files, worker_fn, n_jobs):
+    """
+    Patch the first frames to choose between thread and process workers.
+
+    A few frames are timed one at a time on the calling thread, then a batch is
+    patched on n_jobs threads. The speedup of the batch over the single-thread
+    time shows how much of the work (decode, patch, encode) releases the GIL.
+    The calibration frames are real work, not a dry run. worker_fn returns
+    (success, worker id, seconds) per frame, like _global_patch_frame_wrapper.
+    Returns (worker kind, results of the patched frames, in order).
+    """
+    serial = frame_files[:3]
+    batch = frame_files[3:3 + 4 * n_jobs]
+    results = [worker_fn(fname) for fname in serial]
+    timings = [seconds for _, _, seconds in results]
+    with ThreadPoolExecutor(max_workers=n_jobs, initializer=_start_worker_profile, initargs=(_profile_dir,)) as threads:
+        start = time.perf_counter()
+        results += list(threads.map(worker_fn, batch))
+        wall = time.perf_counter() - start
+    if not batch or wall <= 0:
+        return "thread", results
+    # The median ignores the cold first frame.
+    efficiency = statistics.median(timings) * len(batch) / (wall * min(n_jobs, len(batch)))
+    kind = "thread" if efficiency >= THREAD_EFFICIENCY_THRESHOLD else "process"
+    print(f"📏 Calibration: {n_jobs} threads reached {efficiency:.0%} parallel efficiency; using {kind} workers.")
+    return kind, results
+
+def patch_frames(tmpdir, geometry, n_jobs, executor=None, progress=True, checkpoint=None, temp_format="png", workers="process", report=None):
+    """
+    Patch every extracted frame in tmpdir in place.
+
+    workers picks how frames are spread over n_jobs: "process" uses a process
+    pool (the shared executor when given), "thread" a thread pool, which avoids
+    process start-up and IPC since imread, imwrite and the slice copies release
+    the GIL, and "auto" decides from a calibration on the first frames.
+
+    Frames are handed out in contiguous chunks sized from the frame and worker
+    counts, at most two chunks per worker are in flight, and chunks are counted
+    as they complete in any order, so dispatch cost and memory stay flat however
+    long the clip is. Per-frame latencies go to report when given. Returns the
+    number of patched frames.
+    """
+    from tqdm import tqdm
+    ext = TEMP_FORMATS[temp_format]["ext"]
+    frame_files = sorted([f for f in os.listdir(tmpdir) if f.startswith("frame_") and f.endswith(ext)])
     total = len(frame_files)
     if total == 0:
         print("⚠️ No frames found to patch.")
-        return
+        return 0
+    already_patched = 0
+    if checkpoint is not None and checkpoint.patched:
+        frame_files = [f for f in frame_files if f not in checkpoint.patched]
+        already_patched = total - len(frame_files)
+        print(f"⏭️  Resuming: {already_patched} frames were already patched.")
 
     print(f"🛠️  Patching {total} frames with {n_jobs} workers...")
 
-    # Use functools.partial to create a picklable worker function
-    # with fixed arguments (all except the one that varies per call, which is fname)
-    worker_fn = functools.partial(
-        _global_patch_frame_wrapper,
-        input_dir=tmpdir,
-        patch_width=patch_width,
-        patch_height=patch_height,
-        patch_x=patch_x,
-        patch_y=patch_y,
-        mirror_height=mirror_height,
-        mirror_offset=mirror_offset
-    )
+    thread_fn = functools.partial(_global_patch_frame_wrapper, input_dir=tmpdir, geometry=geometry, temp_format=temp_format)
+    calibrated = []
+    if workers == "auto":
+        if n_jobs > 1:
+            workers, results = _calibrate_workers(frame_files, thread_fn, n_jobs)
+            calibrated = list(zip(frame_files, results))
+            frame_files = frame_files[len(calibrated):]
+        else:
+            # A single worker gains nothing from a separate process.
+            workers = "thread"
+
+    successful_patches = already_patched
+    calibrated_ok = [fname for fname, (ok, _, _) in calibrated if ok is True]
+    successful_patches += len(calibrated_ok)
+    if report is not None:
+        for _, (_, worker, seconds) in calibrated:
+            report.add_latencies(worker, [seconds])
+    if checkpoint is not None and calibrated_ok:
+        checkpoint.mark_patched(*calibrated_ok)
+
+    if workers == "thread":
+        pool, task_kwargs = ThreadPoolExecutor(max_workers=n_jobs, initializer=_start_worker_profile, initargs=(_profile_dir,)), {"geometry": geometry}
+    else:
+        pool, task_kwargs = _patch_pool(geometry, n_jobs, executor)
+    worker_fn = functools.partial(_global_patch_chunk_wrapper, input_dir=tmpdir, temp_format=temp_format, **task_kwargs)
+    chunk_size = _chunk_size(len(frame_files), n_jobs)
+    chunks = (frame_files[i:i + chunk_size] for i in range(0, len(frame_files), chunk_size))
+
+    with pool as executor, \
+            tqdm(total=total, initial=total - len(frame_files), desc="Patching frames", unit="frame", disable=not progress) as pbar:
+        in_flight = {}
+        while True:
+            for chunk in itertools.islice(chunks, max(0, 2 * n_jobs - len(in_flight))):
+                in_flight[executor.submit(worker_fn, chunk)] = chunk
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = in_flight.pop(future)
+                failed, worker, latencies = future.result()
+                if report is not None:
+                    report.add_latencies(worker, latencies)
+                failed = set(failed)
+                patched = [fname for fname in chunk if fname not in failed]
+                successful_patches += len(patched)
+                if checkpoint is not None and patched:
+                    checkpoint.mark_patched(*patched)
+                pbar.update(len(chunk))
 
-    # process_map will pass each item from frame_files as the first argument to worker_fn
-    results = process_map(
-        worker_fn,
-        frame_files,
-        max_workers=n_jobs,
-        desc="Patching frames",
-        unit="frame",
-        chunksize=1
-    )
-    
-    successful_patches = sum(1 for r in results if r is True)
     print(f"✅ {successful_patches}/{total} frames patched successfully.")
+    return successful_patches
 
-def assemble_video(tmpdir, output_path, fps):
-    if not glob.glob(f"{tmpdir}/frame_*.png"):
+def assemble_video(tmpdir, output_path, fps, video_args=None, temp_format="png", frame_size=None, source=None, copy_args=None):
+    """
+    Encode the frames in tmpdir into output_path.
+
+    With copy_args set, the audio and data streams and the metadata of the
+    source video are muxed in as well (see passthrough_args). Returns True if
+    ffmpeg succeeded.
+    """
+    ext = TEMP_FORMATS[temp_format]["ext"]
+    frame_files = sorted(glob.glob(f"{tmpdir}/frame_*{ext}"))
+    if not frame_files:
         print(f"⚠️ No frames found in {tmpdir}. Skipping video assembly.")
-        return
+        return False
+
+    if temp_format == "npy":
+        # ffmpeg cannot read .npy files, so the raw frames are piped to it.
+        import numpy as np
+        encoder = subprocess.Popen(_raw_encoder_cmd(output_path, frame_size, fps, video_args, source, copy_args), stdin=subprocess.PIPE)
+        try:
+            # By index, like ffmpeg's %05d pattern: sorted names put frame_100000
+            # before frame_99999.
+            for index in range(1, len(frame_files) + 1):
+                encoder.stdin.write(np.load(os.path.join(tmpdir, f"frame_{index:05d}.npy")).data)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            encoder.wait()
+        if encoder.returncode != 0:
+            print(f"❌ Error during video assembly: ffmpeg exited with status {encoder.returncode}")
+            print("Make sure ffmpeg is installed and the frames in the temporary directory are valid.")
+            return False
+        return True
 
     cmd = [
         "ffmpeg", "-loglevel", "error", "-y", "-framerate", str(fps),
-        "-i", f"{tmpdir}/frame_%05d.png",
-        "-c:v", "libx264", "-crf", "18", "-preset", "veryslow", "-pix_fmt", "yuv420p",
+        "-i", f"{tmpdir}/frame_%05d{ext}",
+        *passthrough_input(source, copy_args),
+        "-map", "0:v:0",
+        *passthrough_args(1, copy_args),
+        *(video_args or encoder_args()),
         output_path
     ]
     try:
@@ -217,75 +1345,1069 @@ def assemble_video(tmpdir, output_path, fps):
     except subprocess.CalledProcessError as e:
         print(f"❌ Error during video assembly: {e}")
         print("Make sure ffmpeg is installed and the frames in the temporary directory are valid.")
+        return False
+    return True
 
-def main():
+# Single rawvideo file holding every decoded frame for the memmap engine.
+FRAME_STORE = "frames.raw"
+
+def extract_frame_store(input_path, tmpdir, frame_size):
+    """
+    Decode the video into one rawvideo BGR file in tmpdir.
+
+    Returns the number of frames in the store. A trailing partial frame, left by
+    an interrupted decode, is not counted.
+    """
+    os.makedirs(tmpdir, exist_ok=True)
+    store_path = os.path.join(tmpdir, FRAME_STORE)
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-y", "-i", input_path,
+        "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", store_path
+    ]
+    subprocess.run(cmd, check=True)
+    width, height = frame_size
+    return os.path.getsize(store_path) // (width * height * 3)
+
+def _patch_store_range(store_path, shape, start, stop, batch_size, geometry=None):
+    """
+    Worker task: patch frames start..stop of the frame store in place.
+
+    Each worker maps the store itself, so only the path and index range cross
+    the process boundary, never pixel data. The dirty pages are flushed before
+    returning, so a range reported done is on disk. geometry defaults to the one
+    the pool initializer installed. Returns (success, worker id, seconds per
+    frame), each frame taking its share of its batch's time.
+    """
+    import numpy as np
+    geometry = geometry or _worker_geometry
+    frames = np.memmap(store_path, dtype=np.uint8, mode="r+", shape=shape)
+    latencies = []
+    try:
+        for batch_start in range(start, stop, batch_size):
+            batch_stop = min(batch_start + batch_size, stop)
+            batch_time = time.perf_counter()
+            if not patch_batch(frames[batch_start:batch_stop], geometry):
+                return False, _worker_id(), latencies
+            n = batch_stop - batch_start
+            latencies.extend([(time.perf_counter() - batch_time) / n] * n)
+        frames.flush()
+    finally:
+        del frames
+    return True, _worker_id(), latencies
+
+def patch_frame_store(tmpdir, geometry, frame_count, n_jobs, batch_size=8, executor=None, progress=True, checkpoint=None, report=None):
+    """
+    Patch the memmap frame store with workers that each own contiguous index ranges.
+
+    Ranges are logged to the checkpoint as they complete. For a repatch_safe
+    geometry patching only reads rows outside the watermark area, so re-patching
+    a range after a crash, or with a different split when --jobs changed, gives
+    the same frames; process_video does not resume other geometries. Returns the
+    number of patched frames.
+    """
+    from tqdm import tqdm
+    if frame_count == 0:
+        print("⚠️ No frames found to patch.")
+        return 0
+    store_path = os.path.join(tmpdir, FRAME_STORE)
+    shape = (frame_count, geometry.height, geometry.width, 3)
+    # A few ranges per worker keeps them busy when some ranges finish early.
+    range_size = max(batch_size, -(-frame_count // (max(1, n_jobs) * 4)))
+    ranges = [(start, min(start + range_size, frame_count)) for start in range(0, frame_count, range_size)]
+    already_patched = 0
+    if checkpoint is not None and checkpoint.patched:
+        pending = [r for r in ranges if f"{r[0]}:{r[1]}" not in checkpoint.patched]
+        already_patched = sum(stop - start for start, stop in ranges) - sum(stop - start for start, stop in pending)
+        ranges = pending
+        if already_patched:
+            print(f"⏭️  Resuming: {already_patched} frames were already patched.")
+
+    print(f"🛠️  Patching {frame_count} frames in place with {n_jobs} workers...")
+
+    pool, task_kwargs = _patch_pool(geometry, n_jobs, executor)
+    successful_patches = already_patched
+    with pool as executor, tqdm(total=frame_count, initial=already_patched, desc="Patching frames", unit="frame", disable=not progress) as bar:
+        futures = {
+            executor.submit(_patch_store_range, store_path, shape, start, stop, batch_size, **task_kwargs): (start, stop)
+            for start, stop in ranges
+        }
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            bar.update(stop - start)
+            ok, worker, latencies = future.result()
+            if report is not None:
+                report.add_latencies(worker, latencies)
+            if ok is True:
+                successful_patches += stop - start
+                if checkpoint is not None:
+                    checkpoint.mark_patched(f"{start}:{stop}")
+
+    print(f"✅ {successful_patches}/{frame_count} frames patched successfully.")
+    return successful_patches
+
+def assemble_frame_store(tmpdir, output_path, fps, frame_size, video_args=None, source=None, copy_args=None):
+    """
+    Encode the frame store, which ffmpeg reads back sequentially as rawvideo.
+
+    The source's audio is muxed in if copy_args is set. Returns True if ffmpeg
+    succeeded.
+    """
+    cmd = _raw_encoder_cmd(output_path, frame_size, fps, video_args, source, copy_args, os.path.join(tmpdir, FRAME_STORE))
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error during video assembly: {e}")
+        print("Make sure ffmpeg is installed and the frame store in the temporary directory is valid.")
+        return False
+    return True
+
+def pipeline_video(input_path, tmpdir, output_path, fps, geometry, n_jobs, total_frames=None, video_args=None, executor=None, progress=True, temp_format="png", report=None, copy_args=None):
+    """
+    Extract, patch and encode frames with all three stages running at once.
+
+    ffmpeg extracts image frames into tmpdir in the background while patch workers
+    pick up each frame as soon as it is complete, and an encoder ffmpeg reads the
+    patched frames in order from its stdin. Frames are handed to the encoder
+    through a bounded in-order buffer of pending patch jobs, so a slow frame
+    only holds back the encoder, never the extractor or the other workers.
+    tmpdir must not hold frames from an earlier run. Returns True if both ffmpeg
+    processes succeeded and every frame was patched. temp_format must be one of
+    the image formats; "npy" frames are not extracted by ffmpeg itself. With
+    copy_args set, the encoder also muxes in the input's audio (passthrough_args).
+    """
+    from tqdm import tqdm
+    fmt = TEMP_FORMATS[temp_format]
+    os.makedirs(tmpdir, exist_ok=True)
+    extract_cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-i", input_path,
+        *fmt["ffmpeg"],
+        f"{tmpdir}/frame_%05d{fmt['ext']}"
+    ]
+    encode_cmd = [
+        "ffmpeg", "-loglevel", "error", "-y",
+        "-f", "image2pipe", "-c:v", fmt["codec"], "-framerate", str(fps), "-i", "-",
+        *passthrough_input(input_path, copy_args),
+        "-map", "0:v:0",
+        *passthrough_args(1, copy_args),
+        *(video_args or encoder_args()),
+        output_path
+    ]
+    # Enough queued jobs to keep every worker busy while the encoder waits on the oldest one.
+    max_pending = 4 * n_jobs
+    pending = collections.deque()
+    next_index = 1
+    total = 0
+    successful_patches = 0
+
+    def frame_path(index):
+        return os.path.join(tmpdir, f"frame_{index:05d}{fmt['ext']}")
+
+    def encode_oldest():
+        nonlocal total, successful_patches
+        fname, future = pending.popleft()
+        ok, worker, seconds = future.result()
+        if report is not None:
+            report.add_latencies(worker, [seconds])
+        if ok is True:
+            successful_patches += 1
+        with open(os.path.join(tmpdir, fname), "rb") as f:
+            encoder.stdin.write(f.read())
+        total += 1
+        pbar.update()
+
+    pool, task_kwargs = _patch_pool(geometry, n_jobs, executor)
+    extractor = subprocess.Popen(extract_cmd)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE)
+    try:
+        with pool as executor, \
+                tqdm(total=total_frames, desc="Pipelining frames", unit="frame", disable=not progress) as pbar:
+            while True:
+                extractor_done = extractor.poll() is not None
+                # ffmpeg writes frames in order, so a frame is complete once the
+                # next one has appeared or the extractor has exited.
+                if os.path.exists(frame_path(next_index)) and (extractor_done or os.path.exists(frame_path(next_index + 1))):
+                    fname = os.path.basename(frame_path(next_index))
+                    pending.append((fname, executor.submit(_global_patch_frame_wrapper, fname, tmpdir, temp_format=temp_format, **task_kwargs)))
+                    next_index += 1
+                    if len(pending) >= max_pending:
+                        encode_oldest()
+                elif extractor_done:
+                    break
+                else:
+                    while pending and pending[0][1].done():
+                        encode_oldest()
+                    time.sleep(0.005)
+            while pending:
+                encode_oldest()
+    except BrokenPipeError:
+        print("❌ Encoder exited early; see the ffmpeg error above.")
+    finally:
+        ok = _finish_pipes(extractor, encoder, "pipelined processing", "extractor")
+
+    print(f"✅ {successful_patches}/{total} frames patched successfully.")
+    # Frames that failed to patch were still encoded, watermark and all.
+    return ok and successful_patches == total
+
+# Shared-memory ring the current worker process is attached to, kept across tasks.
+_worker_ring = None
+
+def _patch_ring_slot(ring_name, shape, slot, geometry=None):
+    """
+    Worker task: patch one frame slot of the shared-memory ring in place.
+
+    The worker attaches to the ring on its first task and keeps the mapping for
+    the following ones, so a task only carries the ring name and slot index.
+    geometry defaults to the one the pool initializer installed. Returns
+    (success, worker id, seconds spent on the frame).
+    """
+    global _worker_ring
+    import numpy as np
+    from multiprocessing import shared_memory
+    if _worker_ring is None or _worker_ring[0].name != ring_name:
+        if _worker_ring is not None:
+            # Drop the array view before closing, or the mapping cannot be released.
+            ring = _worker_ring[0]
+            _worker_ring = None
+            ring.close()
+        ring = shared_memory.SharedMemory(name=ring_name)
+        _worker_ring = (ring, np.ndarray(shape, dtype=np.uint8, buffer=ring.buf))
+    start = time.perf_counter()
+    ok = patch_batch(_worker_ring[1][slot:slot + 1], geometry or _worker_geometry)
+    return ok, _worker_id(), time.perf_counter() - start
+
+def shm_video(input_path, output_path, fps, geometry, n_jobs, ring_slots=None, total_frames=None, video_args=None, executor=None, progress=True, report=None, copy_args=None):
+    """
+    Patch a video through a shared-memory ring of frame slots.
+
+    A reader thread decodes raw BGR frames from ffmpeg straight into free slots
+    of a multiprocessing.shared_memory block and hands each slot index to the
+    patch workers, which patch the slot in place. The main thread passes slots
+    to the encoder in frame order and then returns them to the free queue. Only
+    slot indices cross the process boundary, and the reader blocks while every
+    slot is in use, so memory stays at ring_slots frames (default: four per
+    worker) however long the clip is. With copy_args set, the encoder also
+    muxes in the input's audio (passthrough_args). Returns True if both ffmpeg
+    processes succeeded.
+    """
+    import numpy as np
+    from multiprocessing import shared_memory
+    from tqdm import tqdm
+    decode_cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-i", input_path,
+        "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+    ]
+    encode_cmd = _raw_encoder_cmd(output_path, (geometry.width, geometry.height), fps, video_args, input_path, copy_args)
+    ring_slots = ring_slots or 4 * n_jobs
+    shape = (ring_slots, geometry.height, geometry.width, 3)
+    ring = shared_memory.SharedMemory(create=True, size=ring_slots * geometry.height * geometry.width * 3)
+    slots = np.ndarray(shape, dtype=np.uint8, buffer=ring.buf)
+    frame_bytes = slots[0].nbytes
+    free_slots = queue.Queue()
+    for slot in range(ring_slots):
+        free_slots.put(slot)
+    # (slot, future) in frame order; None marks the end of the input.
+    in_order = queue.Queue()
+    stop = threading.Event()
+    total = 0
+    successful_patches = 0
+
+    def read_frames():
+        try:
+            while not stop.is_set():
+                try:
+                    slot = free_slots.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if _read_exact(decoder.stdout, slots[slot]) < frame_bytes:
+                    break
+                in_order.put((slot, workers.submit(_patch_ring_slot, ring.name, shape, slot, **task_kwargs)))
+        finally:
+            in_order.put(None)
+
+    pool, task_kwargs = _patch_pool(geometry, n_jobs, executor)
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE)
+    try:
+        with pool as workers, \
+                tqdm(total=total_frames, desc="Patching frames", unit="frame", disable=not progress) as pbar:
+            reader = threading.Thread(target=read_frames, daemon=True)
+            reader.start()
+            try:
+                while True:
+                    item = in_order.get()
+                    if item is None:
+                        break
+                    slot, future = item
+                    ok, worker, seconds = future.result()
+                    if report is not None:
+                        report.add_latencies(worker, [seconds])
+                    patched = ok is True
+                    encoder.stdin.write(slots[slot].data)
+                    free_slots.put(slot)
+                    successful_patches += patched
+                    total += 1
+                    pbar.update()
+            finally:
+                stop.set()
+                reader.join()
+    except BrokenPipeError:
+        print("❌ Encoder exited early; see the ffmpeg error above.")
+    finally:
+        ok = _finish_pipes(decoder, encoder, "shared-memory processing")
+        del slots
+        ring.close()
+        ring.unlink()
+
+    print(f"✅ {successful_patches}/{total} frames patched successfully.")
+    return ok
+
+def _read_exact(stream, buf):
+    """Fill buf from stream, returning the number of bytes read (short only at EOF)."""
+    # Flat byte view: len() of a multi-dimensional memoryview counts rows, not bytes.
+    view = memoryview(buf).cast("B")
+    total = 0
+    while total < len(view):
+        n = stream.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+def _finish_pipes(decoder, encoder, activity, decoder_name="decoder"):
+    """
+    Shut down the ffmpeg process feeding Python and the encoder it feeds, and wait for both.
+
+    A decoder piping to Python has its stdout closed, so if it is still running
+    it stops on a broken pipe rather than blocking; one writing files is
+    terminated. The encoder then sees the end of its input and finishes the
+    output. Reports a failure of either process during activity and returns
+    True if both exited cleanly.
+    """
+    if decoder.stdout is not None:
+        decoder.stdout.close()
+    elif decoder.poll() is None:
+        decoder.terminate()
+    try:
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    decoder.wait()
+    encoder.wait()
+    if decoder.returncode != 0 or encoder.returncode != 0:
+        print(f"❌ Error during {activity} ({decoder_name} exit {decoder.returncode}, encoder exit {encoder.returncode}).")
+        return False
+    return True
+
+def stream_video(input_path, output_path, fps, geometry, batch_size=8, total_frames=None, video_args=None, progress=True, report=None, copy_args=None):
+    """
+    Patch a video without writing frames to disk.
+
+    One ffmpeg process decodes the input to raw BGR frames on its stdout, frames
+    are read batch_size at a time and patched in memory with patch_batch, and the
+    result is piped into a second ffmpeg process that encodes the output video
+    from its stdin. With copy_args set, the encoder also muxes in the input's
+    audio (passthrough_args). Returns True if both ffmpeg processes succeeded.
+    """
+    import numpy as np
+    from tqdm import tqdm
+    decode_cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-i", input_path,
+        "-map", "0:v:0", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+    ]
+    encode_cmd = _raw_encoder_cmd(output_path, (geometry.width, geometry.height), fps, video_args, input_path, copy_args)
+
+    frames = np.empty((batch_size, geometry.height, geometry.width, 3), dtype=np.uint8)
+    frame_bytes = frames[0].nbytes
+    total = 0
+    successful_patches = 0
+
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE)
+    try:
+        with tqdm(total=total_frames, desc="Streaming frames", unit="frame", disable=not progress) as pbar:
+            while True:
+                n = _read_exact(decoder.stdout, frames) // frame_bytes
+                if n == 0:
+                    break
+                batch_time = time.perf_counter()
+                if patch_batch(frames[:n], geometry):
+                    successful_patches += n
+                if report is not None:
+                    report.add_latencies(_worker_id(), [(time.perf_counter() - batch_time) / n] * n)
+                encoder.stdin.write(frames[:n].data)
+                total += n
+                pbar.update(n)
+    except BrokenPipeError:
+        print("❌ Encoder exited early; see the ffmpeg error above.")
+    finally:
+        ok = _finish_pipes(decoder, encoder, "streaming")
+
+    print(f"✅ {successful_patches}/{total} frames patched successfully.")
+    return ok
+
+def strip_video(input_path, output_path, fps, geometry, batch_size=8, total_frames=None, video_args=None, progress=True, report=None, copy_args=None):
+    """
+    Patch a video while only moving the patch's source pixels through Python.
+
+    The decoder cuts the mirror and adjacent source rectangles out of every
+    frame and emits them stacked as raw BGR (see PatchGeometry.sources_filter),
+    about 36 KB per frame for the default geometry. Python flips the mirror half
+    in place, which makes the stack the patch, and sends it back; the encoder
+    overlays it onto the original frames inside its own filtergraph, along with
+    the original's audio if copy_args is set. Both encoder inputs are retimed
+    by frame index, so each patch lands on the frame it was cut from even when
+    the input has variable frame timing. Returns True if both ffmpeg processes
+    succeeded.
+    """
+    import numpy as np
+    from tqdm import tqdm
+    decode_cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-i", input_path,
+        "-filter_complex", f"[0:v:0]format=bgr24,{geometry.sources_filter()}[out]", "-map", "[out]",
+        "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"
+    ]
+    # The decoder emits one patch per decoded frame (no CFR duplication) and both
+    # inputs get the same time base and timestamps from the frame index, so
+    # overlay pairs the Nth patch with the Nth frame even on VFR sources.
+    retime = f"settb=AVTB,setpts=N/({fps!r}*TB)"
+    # overlay in yuv420 rounds odd offsets and sizes to the chroma grid; yuv444
+    # places them exactly but costs about an eighth more encoder time.
+    aligned = all(v % 2 == 0 for v in (geometry.patch_x, geometry.wm_y_start, geometry.patch_width, geometry.patch_height))
+    overlay_format = "yuv420" if aligned else "yuv444"
+    encode_cmd = [
+        "ffmpeg", "-loglevel", "error", "-y", "-i", input_path,
+        *_rawvideo_input((geometry.patch_width, geometry.patch_height), fps),
+        "-filter_complex",
+        f"[0:v]{retime}[base];[1:v]{retime}[patch];"
+        f"[base][patch]overlay={geometry.patch_x}:{geometry.wm_y_start}:eof_action=pass:format={overlay_format}[out]",
+        "-map", "[out]",
+        *passthrough_args(0, copy_args),
+        *(video_args or encoder_args()),
+        output_path
+    ]
+
+    patches = np.empty((batch_size, geometry.patch_height, geometry.patch_width, 3), dtype=np.uint8)
+    patch_bytes = patches[0].nbytes
+    mirror_rows = geometry.mirror_height
+    total = 0
+
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE)
+    try:
+        with tqdm(total=total_frames, desc="Streaming patches", unit="frame", disable=not progress) as pbar:
+            while True:
+                n = _read_exact(decoder.stdout, patches) // patch_bytes
+                if n == 0:
+                    break
+                batch_time = time.perf_counter()
+                # NumPy copies the overlapping reversed view before writing it back.
+                patches[:n, :mirror_rows] = patches[:n, mirror_rows - 1::-1]
+                if report is not None:
+                    report.add_latencies(_worker_id(), [(time.perf_counter() - batch_time) / n] * n)
+                encoder.stdin.write(patches[:n].data)
+                total += n
+                pbar.update(n)
+    except BrokenPipeError:
+        print("❌ Encoder exited early; see the ffmpeg error above.")
+    finally:
+        ok = _finish_pipes(decoder, encoder, "streaming")
+
+    # Flipping the mirror half cannot fail; what can is the hand-off, so count
+    # the patches written to the encoder rather than claim a success ratio.
+    print(f"✅ {total} patches written to the encoder.")
+    return ok
+
+def build_filtergraph(geometry):
+    """
+    Build an ffmpeg -filter_complex graph that performs the same patch as patch_batch.
+
+    The mirrored source above the watermark is cropped and flipped vertically, the
+    adjacent source to its right is cropped, the two are stacked into the patch and
+    the patch is overlaid on the watermark. Frames are converted to BGR first and
+    overlaid in RGB, as the other engines patch them: crop and overlay on yuv420p
+    round offsets and sizes to the chroma grid, which shifts odd geometries.
+    """
+    g = geometry
+    adjacent_patch_height = g.patch_height - g.mirror_height
+    return (
+        "[0:v]format=bgr24,split=3[base][mirror_src][adj_src];"
+        f"[mirror_src]crop={g.patch_width}:{g.mirror_height}:{g.patch_x}:{g.mirror_src_y_start},vflip[mirrored];"
+        f"[adj_src]crop={g.patch_width}:{adjacent_patch_height}:{g.patch_x + g.patch_width}:{g.adj_src_y_start}[adjacent];"
+        "[mirrored][adjacent]vstack[patch];"
+        f"[base][patch]overlay={g.patch_x}:{g.wm_y_start}:format=rgb[out]"
+    )
+
+def filtergraph_video(input_path, output_path, filtergraph, video_args=None, copy_args=None):
+    """
+    Decode, patch and encode in a single ffmpeg process using filtergraph.
+
+    The audio of the input is kept when copy_args is set. Returns True on success.
+    """
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-y", "-i", input_path,
+        "-filter_complex", filtergraph, "-map", "[out]",
+        *passthrough_args(0, copy_args),
+        *(video_args or encoder_args()),
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error during filtergraph processing: {e}")
+        print("Check that the patch geometry fits inside the video frame.")
+        return False
+    return True
+
+def keyframe_times(input_path):
+    """List the presentation times (seconds) of the video keyframes using ffprobe."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+        "-show_entries", "frame=pts_time", "-of", "csv=p=0", input_path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    times = []
+    for line in result.stdout.split():
+        try:
+            times.append(float(line.strip(",")))
+        except ValueError:
+            continue
+    return sorted(times)
+
+def plan_segments(keyframes, n_segments, duration=None):
+    """
+    Pick up to n_segments - 1 split points among keyframes, as evenly spaced in time as possible.
+
+    Returns the sorted split times; splitting at keyframes lets the segments be
+    cut with stream copy, without re-encoding.
+    """
+    candidates = [t for t in keyframes if t > 0]
+    if not candidates or n_segments < 2:
+        return []
+    end = duration or candidates[-1]
+    splits = set()
+    for i in range(1, n_segments):
+        target = end * i / n_segments
+        splits.add(min(candidates, key=lambda t: abs(t - target)))
+    return sorted(splits)
+
+def split_video(input_path, split_times, workdir):
+    """Split the video stream at split_times into Matroska segments using stream copy."""
+    os.makedirs(workdir, exist_ok=True)
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-nostdin", "-y", "-i", input_path,
+        "-map", "0:v:0", "-c", "copy", "-f", "segment", "-reset_timestamps", "1",
+    ]
+    if split_times:
+        cmd += ["-segment_times", ",".join(f"{t:.6f}" for t in split_times)]
+    cmd.append(os.path.join(workdir, "segment_%03d.mkv"))
+    subprocess.run(cmd, check=True)
+    return sorted(glob.glob(os.path.join(workdir, "segment_[0-9][0-9][0-9].mkv")))
+
+def concat_segments(segment_paths, output_path, workdir, source=None, copy_args=None, tag_args=None):
+    """
+    Join encoded segments losslessly with the ffmpeg concat demuxer.
+
+    The segments hold video only; with copy_args set, the audio and data
+    streams and the metadata of the source video are muxed in at this step,
+    and tag_args (see codec_tag_args) sets the video codec tag of the output.
+    Returns True if ffmpeg succeeded.
+    """
+    list_path = os.path.join(workdir, "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+        "-i", list_path,
+        *passthrough_input(source, copy_args),
+        "-map", "0:v:0", "-c", "copy", *(tag_args or []),
+        *passthrough_args(1, copy_args),
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error while joining segments: {e}")
+        return False
+    return True
+
+def _process_segment(engine, segment_path, output_path, fps, geometry, batch_size, video_args):
+    """
+    Run a streaming engine on one segment; top-level so it can run in a worker process.
+    Returns True if the encoded segment was written successfully.
+    """
+    if engine == "filtergraph":
+        return filtergraph_video(segment_path, output_path, build_filtergraph(geometry), video_args)
+    stream_fn = strip_video if engine == "strip" else stream_video
+    return stream_fn(segment_path, output_path, fps, geometry, batch_size, video_args=video_args, progress=False)
+
+def segment_video(input_path, workdir, output_path, fps, geometry, engine, n_segments, batch_size=8, video_args=None, duration=None, checkpoint=None, copy_args=None, tag_args=None):
+    """
+    Process a long clip as keyframe-aligned segments in parallel.
+
+    The input is split at keyframes into up to n_segments pieces with stream
+    copy, each piece runs through the selected streaming engine in its own
+    worker process, and the encoded pieces are joined with the concat demuxer,
+    which also adds the input's audio when copy_args is set. With a checkpoint,
+    the split and every successfully encoded segment are recorded so a
+    restarted run only redoes unfinished segments. tag_args is applied at the
+    join (see concat_segments). Returns True if every segment was encoded and
+    the join succeeded.
+    """
+    from tqdm import tqdm
+    if checkpoint is not None and checkpoint.is_done("split"):
+        segment_paths = [os.path.join(workdir, name) for name in checkpoint.data["segment_files"]]
+        print(f"⏭️  Resuming: reusing {len(segment_paths)} segment(s) split by a previous run.")
+    else:
+        split_times = plan_segments(keyframe_times(input_path), n_segments, duration)
+        segment_paths = split_video(input_path, split_times, workdir)
+        if checkpoint is not None:
+            checkpoint.mark_done("split", segment_files=[os.path.basename(p) for p in segment_paths])
+    if not segment_paths:
+        print("⚠️ No segments were produced. Skipping video assembly.")
+        return False
+    print(f"✂️  Split into {len(segment_paths)} keyframe-aligned segment(s) in {workdir}")
+
+    outputs = [os.path.join(workdir, f"encoded_{i:03d}.mkv") for i in range(len(segment_paths))]
+    todo = [
+        (seg, out) for seg, out in zip(segment_paths, outputs)
+        if checkpoint is None or not checkpoint.segment_encoded(os.path.basename(out))
+    ]
+    if len(todo) < len(outputs):
+        print(f"⏭️  Resuming: {len(outputs) - len(todo)} segment(s) were already encoded.")
+    if todo:
+        with ProcessPoolExecutor(max_workers=len(todo), initializer=_start_worker_profile, initargs=(_profile_dir,)) as executor:
+            futures = {
+                executor.submit(_process_segment, engine, seg, out, fps, geometry, batch_size, video_args): out
+                for seg, out in todo
+            }
+            failed = 0
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing segments", unit="segment"):
+                if not future.result():
+                    failed += 1
+                elif checkpoint is not None:
+                    checkpoint.mark_segment_encoded(os.path.basename(futures[future]))
+        if failed:
+            print(f"❌ {failed} segment(s) failed; not joining an incomplete video.")
+            return False
+
+    print(f"🔗 Joining {len(outputs)} segment(s) into {output_path}...")
+    return concat_segments(outputs, output_path, workdir, input_path, copy_args, tag_args)
+
+# Extensions picked up when a directory or glob is given as input.
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+
+def expand_inputs(patterns):
+    """
+    Expand input files, directories and glob patterns into a sorted list of videos.
+
+    Directories are searched recursively for files with a known video extension.
+    Previous outputs (names ending in "_cleaned") are skipped unless named explicitly.
+    """
+    found = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_file():
+            found.append(path)
+            continue
+        if path.is_dir():
+            candidates = path.rglob("*")
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        found.extend(
+            p for p in candidates
+            if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS and not p.stem.endswith("_cleaned")
+        )
+    unique = {}
+    for p in found:
+        unique.setdefault(p.resolve(), p)
+    return sorted(unique.values())
+
+def build_parser():
     parser = argparse.ArgumentParser(description="Remove Bushnell trail camera watermark from video.")
-    parser.add_argument("input", help="Input video file")
+    parser.add_argument("input", nargs="+", help="Input video file(s), directories or glob patterns; more than one video runs in batch mode")
     parser.add_argument("-o", "--output", help="Output video file (default: <input>_cleaned.mp4)")
+    parser.add_argument("--output-dir", type=Path, help="Directory for batch outputs (default: next to each input)")
+    parser.add_argument("--config", help="JSON file of option defaults, e.g. {\"engine\": \"stream\", \"encoder\": \"fast\"}; command-line options take precedence")
     parser.add_argument("--patch-width", type=int, default=110, help="Patch width (default: 110)")
     parser.add_argument("--patch-height", type=int, default=110, help="Patch height (default: 110)")
     parser.add_argument("--patch-x", type=int, default=0, help="Patch X offset (bottom-left corner of patch area) (default: 0)")
     parser.add_argument("--patch-y", type=int, default=0, help="Patch Y offset (bottom-left corner of the watermark area, measured from the bottom of the frame) (default: 0)")
     parser.add_argument("--mirror-height", type=int, default=54, help="Height of the content that will be mirrored to form the upper part of the patch (default: 54 for Bushnell)")
     parser.add_argument("--mirror-offset", type=int, default=56, help="Vertical offset (pixels) *above* the main watermark area from where the source content for mirroring is taken (default: 56 for Bushnell, typically above the orange square, within the actual video content)")
+    parser.add_argument("--auto-detect", action="store_true", help="Locate the logo and the info bar in a few sampled frames instead of using the --patch-*/--mirror-* options; the result is cached per resolution")
     parser.add_argument("--tmpdir", help="Temporary directory (default: frames_<input name>)")
     parser.add_argument("--keep-temp", action="store_true", help="Keep temporary frames directory")
+    parser.add_argument("--temp-format", choices=list(TEMP_FORMATS), default="png", help="Intermediate frame format for the disk and pipelined engines: png, png0 (uncompressed PNG), bmp, ppm or npy (raw NumPy arrays, disk engine only) (default: png)")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint manifest left in the temporary directory by an interrupted run and start over")
+    parser.add_argument("--engine", choices=["disk", "pipelined", "memmap", "shm", "stream", "strip", "filtergraph"], default="disk", help="Processing engine: 'disk' extracts PNG frames to the temporary directory, 'pipelined' does the same with extraction, patching and encoding overlapped, 'memmap' decodes into one raw frame file that workers patch in place, 'shm' passes frames to the patch workers through a shared-memory ring, 'stream' pipes raw frames between two ffmpeg processes without touching the disk, 'strip' pipes only the bottom band of each frame through Python, 'filtergraph' patches inside a single ffmpeg process (default: disk)")
+    parser.add_argument("--segments", type=int, default=1, help="Split the input at keyframes into this many segments and process them in parallel with the stream, strip or filtergraph engine (default: 1, no splitting)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames patched per vectorized batch by the memmap, stream and strip engines (default: 8)")
+    parser.add_argument("--ring-slots", type=int, help="Frame slots in the shm engine's shared-memory ring; decoding pauses while all are in use (default: 4 per job)")
+    parser.add_argument("--encoder", choices=sorted(ENCODER_PROFILES), default=DEFAULT_ENCODER_PROFILE, help="Encoder profile for the output video: archive (libx264 veryslow), balanced, fast, hevc (libx265), av1 (libsvtav1) or lossless-intermediate (ffv1, .mkv) (default: archive)")
+    parser.add_argument("--crf", type=int, help="Override the encoder profile's CRF")
+    parser.add_argument("--preset", help="Override the encoder profile's preset")
+    parser.add_argument("--no-audio", action="store_true", help="Drop the input's audio and data streams instead of copying them into the output")
+    parser.add_argument("--encoder-threads", type=int, help="Thread count for the output encoder (default: ffmpeg's choice)")
+    parser.add_argument("--cache-dir", type=Path, default=default_cache_dir(), help="Directory for cached probe results, ffmpeg capabilities and outputs (default: ~/.cache/bushnell-watermark-remover)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write any cache")
+    parser.add_argument("--output-cache", action="store_true", help="Reuse the cleaned output of an identical input processed earlier with the same geometry and encoder settings, and cache new outputs (hardlinked) in the cache directory")
+    parser.add_argument("--output-cache-size", type=float, default=20.0, help="Size limit of the output cache in GB; least recently used outputs are evicted beyond it (default: 20)")
     parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of parallel jobs (default: all cores)")
-    args = parser.parse_args()
+    parser.add_argument("--workers", choices=["process", "thread", "auto"], default="auto", help="Disk engine: patch frames in worker processes, in threads, or pick one from a short calibration on the first frames (default: auto)")
+    parser.add_argument("--report", type=Path, help="Write per-stage timings (wall and CPU time, fps, bytes read and written) and per-worker patch latency histograms to this JSON file")
+    parser.add_argument("--profile", type=Path, metavar="DIR", help="Profile the run with cProfile, including every patch worker process and thread, and write the merged, sorted report to DIR/profile.txt")
+    parser.add_argument("--parallel-clips", type=int, default=2, help="In batch mode, number of clips (and so sets of ffmpeg processes) in flight at once (default: 2)")
+    return parser
 
-    check_ffmpeg()
+def parse_args(argv=None):
+    """Parse the command line, applying defaults from a --config JSON file first."""
+    parser = build_parser()
+    config_parser = argparse.ArgumentParser(add_help=False)
+    config_parser.add_argument("--config")
+    known, _ = config_parser.parse_known_args(argv)
+    if known.config:
+        try:
+            with open(known.config, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"could not read config file '{known.config}': {e}")
+        if not isinstance(config, dict):
+            parser.error(f"config file '{known.config}' must contain a JSON object")
+        actions = {action.dest: action for action in parser._actions}
+        defaults = {}
+        for key, value in config.items():
+            dest = key.replace("-", "_")
+            if dest in ("input", "config", "help") or dest not in actions:
+                parser.error(f"unknown option '{key}' in config file '{known.config}'")
+            choices = actions[dest].choices
+            if choices is not None and value not in choices:
+                parser.error(f"invalid value {value!r} for '{key}' in config file '{known.config}' (choose from {', '.join(map(str, choices))})")
+            defaults[dest] = value
+        parser.set_defaults(**defaults)
+    return parser.parse_args(argv)
 
-    input_path = Path(args.input)
-    if not input_path.is_file():
-        print(f"Error: input file '{input_path}' not found.")
-        sys.exit(1)
+def process_video(input_path, output_path, tmpdir, args, executor=None, progress=True):
+    """
+    Remove the watermark from one video with the engine selected in args.
 
-    name = input_path.stem
-    output_path = Path(args.output or f"{name}_cleaned{input_path.suffix}")
-    tmpdir = Path(args.tmpdir or f"frames_{name}")
+    executor is an optional process pool shared between clips, used by the disk
+    pipelined, memmap and shm engines instead of creating a pool per clip.
+
+    Returns:
+        dict: Per-clip statistics (input, output, frames, bytes, elapsed, ok,
+        engine) and the RunReport of its stages under "report".
+
+    Raises:
+        ValueError: If the input cannot be probed or the patch geometry does not fit.
+    """
+    extension = ENCODER_PROFILES[args.encoder].get("extension", input_path.suffix)
+    encoder_threads = args.encoder_threads
+    if args.segments > 1 and not encoder_threads:
+        # Segment encoders run side by side; share the cores between them.
+        encoder_threads = max(1, (os.cpu_count() or 1) // args.segments)
+    segment_args = encoder_args(args.encoder, args.crf, args.preset, encoder_threads)
+    # Segments are .mkv; the codec tag for the output container is set when they are joined.
+    tag_args = codec_tag_args(args.encoder, output_path)
+    video_args = segment_args + tag_args
+    if output_path.suffix.lower() != extension.lower() and "extension" in ENCODER_PROFILES[args.encoder]:
+        print(f"⚠️ The {args.encoder} encoder profile expects a {extension} output; {output_path.suffix} may not be able to hold it.")
+    if args.segments > 1 and args.engine not in ("stream", "strip", "filtergraph"):
+        raise ValueError(f"--segments requires the stream, strip or filtergraph engine, not '{args.engine}'.")
+    if args.engine == "pipelined" and args.temp_format == "npy":
+        raise ValueError("the pipelined engine needs an image --temp-format (png, png0, bmp or ppm), not 'npy'.")
 
     start_time = time.time()
     
     print(f"⏳ Starting watermark removal for {input_path}...")
-    print(f"⚙️  Parameters: Patch(W:{args.patch_width}, H:{args.patch_height}, X:{args.patch_x}, Y:{args.patch_y}), Mirror(H:{args.mirror_height}, Offset:{args.mirror_offset})")
-    print(f"🕒 Using {args.jobs} worker(s). Output to: {output_path}, Temp dir: {tmpdir}")
-
-    print(f"📸 Extracting frames from {input_path} to {tmpdir}...")
-    extract_frames(str(input_path), str(tmpdir))
-
-    fps = get_fps(str(input_path))
-    print(f"🎞️  Detected video frame rate: {fps:.2f} fps")
-
-    patch_frames(
-        str(tmpdir),
-        args.patch_width,
-        args.patch_height,
-        args.patch_x,
-        args.patch_y,
-        args.mirror_height,
-        args.mirror_offset,
-        args.jobs
-    )
+    if not args.auto_detect:
+        print(f"⚙️  Parameters: Patch(W:{args.patch_width}, H:{args.patch_height}, X:{args.patch_x}, Y:{args.patch_y}), Mirror(H:{args.mirror_height}, Offset:{args.mirror_offset})")
+    print(f"🎛️  Encoder profile: {args.encoder} ({' '.join(video_args)})")
+
+    report = RunReport()
+    input_bytes = input_path.stat().st_size
+    with report.stage("probe"):
+        try:
+            probe = probe_video(str(input_path), None if args.no_cache else args.cache_dir)
+        except ValueError as e:
+            raise ValueError(f"could not probe '{input_path}': {e}") from e
+    fps = probe.fps
+    frame_info = f", ~{probe.frame_count} frames" if probe.frame_count else ""
+    print(f"🎞️  Detected video: {probe.width}x{probe.height} {probe.codec} at {fps:.2f} fps{frame_info}")
+    copy_args = None if args.no_audio else stream_copy_args(probe.audio_streams, output_path)
+    if copy_args is not None and probe.audio_streams:
+        codecs = ", ".join(str(s["codec"]) for s in probe.audio_streams)
+        how = "copied" if copy_args[1] == "copy" else f"encoded to {copy_args[1]} for {output_path.suffix}"
+        print(f"🔊 Audio: {len(probe.audio_streams)} stream(s) ({codecs}), {how}")
+    if args.auto_detect:
+        with report.stage("detect"):
+            try:
+                geometry, cached = detected_geometry(str(input_path), probe.width, probe.height, probe.duration, None if args.no_cache else args.cache_dir)
+            except ValueError as e:
+                raise ValueError(f"could not detect the watermark: {e}") from e
+        source = f"cached for {probe.width}x{probe.height}" if cached else "detected"
+        print(f"🔍 Watermark geometry {source}: {geometry}")
+    else:
+        try:
+            geometry = PatchGeometry.from_args(args, probe.width, probe.height)
+        except ValueError as e:
+            raise ValueError(f"invalid patch geometry: {e}") from e
+
+    output_cache = cache_key = None
+    if args.output_cache and not args.no_cache:
+        output_cache = OutputCache(args.cache_dir, int(args.output_cache_size * 1e9))
+        cache_key = OutputCache.make_key(str(input_path), geometry, video_args, copy_args)
+        with report.stage("cache") as stage:
+            hit = output_cache.lookup(cache_key, output_path)
+            stage["bytes_read"] = input_bytes
+        if hit:
+            print(f"♻️  Cache hit: {input_path} was already cleaned with these settings; output placed at {output_path}")
+            return {
+                "input": str(input_path),
+                "output": str(output_path),
+                "frames": probe.frame_count or 0,
+                "bytes": input_bytes,
+                "elapsed": time.time() - start_time,
+                "ok": True,
+                "engine": args.engine,
+                "report": report.to_dict(),
+            }
 
-    print(f"🎞️  Encoding final video to {output_path} at {fps:.2f} fps...")
-    assemble_video(str(tmpdir), str(output_path), fps)
+    # ffmpeg truncates an existing output in place. An output with other links may
+    # be hardlinked into the output cache by an earlier --output-cache run, so
+    # unlink it first, whatever this run's cache options, to leave that file intact.
+    if output_path.exists() and output_path.stat().st_nlink > 1:
+        output_path.unlink()
+
+    checkpoint = None
+    if args.engine in ("disk", "pipelined", "memmap") or args.segments > 1:
+        stat = input_path.stat()
+        checkpoint_key = {
+            "input": str(input_path.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "geometry": repr(geometry),
+        }
+        if args.engine == "disk":
+            checkpoint_key["temp_format"] = args.temp_format
+        if args.segments > 1:
+            checkpoint_key.update(engine=args.engine, segments=args.segments, video_args=video_args)
+        # The pipelined engine cannot resume: it takes any frame file as extracted
+        # once the next one exists. Its checkpoint only clears frames left in
+        # tmpdir by an earlier run, which it would otherwise patch and encode.
+        resume = not args.no_resume and args.engine != "pipelined"
+        if resume and not geometry.repatch_safe and args.segments <= 1:
+            # Frames finished but not yet logged when a run is killed are patched
+            # again on resume, which this geometry does not tolerate.
+            print("⚠️ The mirror source overlaps the watermark area (--mirror-offset < --mirror-height), so an interrupted run cannot be resumed safely; starting over.")
+            resume = False
+        checkpoint = Checkpoint(tmpdir, checkpoint_key, resume=resume)
+
+    # Engines that overlap decoding, patching and encoding are timed as a single
+    # "pipeline" stage; the disk and memmap engines as extract, patch and encode.
+    engine_ok = True
+    if args.engine in ("disk", "memmap") and args.segments <= 1:
+        print(f"🕒 Using {args.jobs} worker(s). Output to: {output_path}, Temp dir: {tmpdir}")
+        with report.stage("extract") as stage:
+            if args.engine == "memmap":
+                if checkpoint.is_done("extract"):
+                    frame_count = checkpoint.data["frame_count"]
+                    print(f"⏭️  Resuming: {frame_count} frames were already decoded to {tmpdir}.")
+                else:
+                    print(f"📸 Decoding {input_path} into a single frame store in {tmpdir}...")
+                    frame_count = extract_frame_store(str(input_path), str(tmpdir), (probe.width, probe.height))
+                    checkpoint.mark_done("extract", frame_count=frame_count)
+                frame_bytes = _file_bytes(tmpdir / FRAME_STORE)
+            else:
+                if checkpoint.is_done("extract"):
+                    print(f"⏭️  Resuming: frames were already extracted to {tmpdir}.")
+                else:
+                    print(f"📸 Extracting frames from {input_path} to {tmpdir}...")
+                    extract_frames(str(input_path), str(tmpdir), args.temp_format, (probe.width, probe.height))
+                    checkpoint.mark_done("extract")
+                frame_count, frame_bytes = _usage(tmpdir, f"frame_*{TEMP_FORMATS[args.temp_format]['ext']}")
+            stage.update(frames=frame_count, bytes_read=input_bytes, bytes_written=frame_bytes)
+
+        with report.stage("patch") as stage:
+            if args.engine == "memmap":
+                patched = patch_frame_store(str(tmpdir), geometry, frame_count, args.jobs, args.batch_size, executor, progress, checkpoint, report)
+                # Only the pages of the rows around the watermark are touched.
+                patched_bytes = patched * (geometry.wm_y_end - geometry.mirror_src_y_start) * geometry.width * 3
+                stage.update(frames=patched, bytes_read=patched_bytes, bytes_written=patched_bytes)
+            else:
+                patched = patch_frames(str(tmpdir), geometry, args.jobs, executor, progress, checkpoint, args.temp_format, args.workers, report)
+                _, frame_bytes = _usage(tmpdir, f"frame_*{TEMP_FORMATS[args.temp_format]['ext']}")
+                stage.update(frames=patched, bytes_read=frame_bytes, bytes_written=frame_bytes)
+            checkpoint.close()
+        # Frames that failed to patch still carry the watermark.
+        engine_ok = patched == frame_count
+
+        with report.stage("encode") as stage:
+            print(f"🎞️  Encoding final video to {output_path} at {fps:.2f} fps...")
+            if args.engine == "memmap":
+                engine_ok &= assemble_frame_store(str(tmpdir), str(output_path), fps, (probe.width, probe.height), video_args, str(input_path), copy_args)
+            else:
+                engine_ok &= assemble_video(str(tmpdir), str(output_path), fps, video_args, args.temp_format, (probe.width, probe.height), str(input_path), copy_args)
+            stage.update(frames=frame_count, bytes_read=frame_bytes, bytes_written=_file_bytes(output_path))
+    else:
+        with report.stage("pipeline") as stage:
+            if args.segments > 1:
+                print(f"🧮 Processing {input_path} as up to {args.segments} parallel segments with the {args.engine} engine...")
+                engine_ok = segment_video(str(input_path), str(tmpdir), str(output_path), fps, geometry, args.engine, args.segments, args.batch_size, segment_args, probe.duration, checkpoint, copy_args, tag_args)
+            elif args.engine in ("stream", "strip"):
+                print(f"🌊 Streaming frames through ffmpeg to {output_path}...")
+                stream_fn = strip_video if args.engine == "strip" else stream_video
+                engine_ok = stream_fn(str(input_path), str(output_path), fps, geometry, args.batch_size, probe.frame_count, video_args, progress, report, copy_args)
+            elif args.engine == "filtergraph":
+                print(f"🧩 Patching and encoding to {output_path} with a single ffmpeg filtergraph...")
+                engine_ok = filtergraph_video(str(input_path), str(output_path), build_filtergraph(geometry), video_args, copy_args)
+            elif args.engine == "shm":
+                print(f"🕒 Using {args.jobs} worker(s). Output to: {output_path}")
+                print(f"🔁 Patching {input_path} through a shared-memory ring of {args.ring_slots or 4 * args.jobs} frame slots...")
+                engine_ok = shm_video(str(input_path), str(output_path), fps, geometry, args.jobs, args.ring_slots, probe.frame_count, video_args, executor, progress, report, copy_args)
+            else:
+                print(f"🕒 Using {args.jobs} worker(s). Output to: {output_path}, Temp dir: {tmpdir}")
+                print(f"🔀 Extracting, patching and encoding {input_path} concurrently...")
+                engine_ok = pipeline_video(str(input_path), str(tmpdir), str(output_path), fps, geometry, args.jobs, probe.frame_count, video_args, executor, progress, args.temp_format, report, copy_args)
+            stage.update(frames=probe.frame_count, bytes_read=input_bytes, bytes_written=_file_bytes(output_path))
 
     end_time = time.time()
     elapsed = end_time - start_time
     
     print(f"🕒 Total processing time: {int(elapsed // 60)}m {int(elapsed % 60):02d}s")
     
-    if output_path.exists() and output_path.stat().st_size > 0:
+    output_written = output_path.exists() and output_path.stat().st_size > 0
+    ok = engine_ok and output_written
+    if ok:
         print(f"✅ Done! Output written to: {output_path}")
+        if output_cache is not None:
+            output_cache.store(cache_key, output_path)
+    elif output_written:
+        print(f"❌ Processing failed; {output_path} is incomplete.")
     else:
         print(f"❌ Output file {output_path} was not created or is empty.")
 
-    if not args.keep_temp:
-        if tmpdir.exists():
-            shutil.rmtree(tmpdir)
-            print(f"🧹 Temporary directory '{tmpdir}' removed.")
-    else:
-        print(f"🗂️  Temporary frames kept in '{tmpdir}'.")
+    if args.engine in ("disk", "pipelined", "memmap") or args.segments > 1:
+        if not args.keep_temp:
+            with report.stage("cleanup"):
+                if tmpdir.exists():
+                    shutil.rmtree(tmpdir)
+                    print(f"🧹 Temporary directory '{tmpdir}' removed.")
+        else:
+            print(f"🗂️  Temporary frames kept in '{tmpdir}'.")
+    print(report.summary())
+
+    return {
+        "input": str(input_path),
+        "output": str(output_path),
+        "frames": probe.frame_count or 0,
+        "bytes": input_bytes,
+        "elapsed": elapsed,
+        "ok": ok,
+        "engine": args.engine,
+        "report": report.to_dict(),
+    }
+
+def run_batch(inputs, args):
+    """
+    Process many clips through one persistent worker pool.
+
+    Up to --parallel-clips clips are in flight at once, which bounds the number
+    of concurrent ffmpeg processes; the disk, pipelined, memmap and shm engines share a single
+    patch worker pool instead of starting one per clip. Returns the number of
+    failed clips.
+    """
+    from tqdm import tqdm
+    profile_extension = ENCODER_PROFILES[args.encoder].get("extension")
+    jobs = []
+    used_outputs = set()
+    for i, input_path in enumerate(inputs):
+        out_dir = args.output_dir or input_path.parent
+        extension = profile_extension or input_path.suffix
+        output_path = out_dir / f"{input_path.stem}_cleaned{extension}"
+        if output_path in used_outputs:
+            output_path = out_dir / f"{input_path.stem}_{i:04d}_cleaned{extension}"
+        used_outputs.add(output_path)
+        tmp_root = Path(args.tmpdir) if args.tmpdir else Path(".")
+        jobs.append((input_path, output_path, tmp_root / f"frames_{i:04d}_{input_path.stem}"))
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 Batch mode: {len(jobs)} clip(s), {args.parallel_clips} at a time, {args.jobs} patch worker(s)")
+    start_time = time.time()
+    results = []
+    failures = []
+    # Clips run on threads, and the pool starts workers on demand from any of
+    # them; forking while another thread holds a lock (the shared-memory
+    # resource tracker's, for one) would leave that lock held in the worker.
+    # A fork server starts workers from a clean single-threaded process.
+    mp_context = multiprocessing.get_context("forkserver") if "forkserver" in multiprocessing.get_all_start_methods() else None
+    pool = ProcessPoolExecutor(max_workers=args.jobs, mp_context=mp_context, initializer=_start_worker_profile, initargs=(_profile_dir,)) if args.engine in ("disk", "pipelined", "memmap", "shm") else contextlib.nullcontext()
+    with pool as executor, ThreadPoolExecutor(max_workers=max(1, args.parallel_clips), initializer=_start_worker_profile, initargs=(_profile_dir,)) as clips:
+        futures = {
+            clips.submit(process_video, input_path, output_path, tmpdir, args, executor, False): input_path
+            for input_path, output_path, tmpdir in jobs
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing clips", unit="clip"):
+            input_path = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures.append((input_path, str(e)))
+                continue
+            results.append(stats)
+            if not stats["ok"]:
+                failures.append((input_path, "output was not created or is empty"))
+
+    elapsed = time.time() - start_time
+    frames = sum(r["frames"] for r in results)
+    size_mb = sum(r["bytes"] for r in results) / 1e6
+    print(f"📊 Batch summary: {len(jobs) - len(failures)}/{len(jobs)} clip(s) succeeded in {int(elapsed // 60)}m {int(elapsed % 60):02d}s")
+    if elapsed > 0:
+        print(f"   {frames} frames, {size_mb:.1f} MB of input: {frames / elapsed:.1f} frames/s, {size_mb / elapsed:.2f} MB/s, {len(results) / elapsed * 60:.1f} clips/min")
+    for input_path, reason in failures:
+        print(f"   ❌ {input_path}: {reason}")
+    if args.report:
+        write_report(args.report, results, failures)
+    return len(failures)
+
+def main():
+    args = parse_args()
+
+    tools = check_ffmpeg(None if args.no_cache else args.cache_dir)
+    select_supported(args, tools)
+
+    with profiling(args.profile) if args.profile else contextlib.nullcontext():
+        inputs = expand_inputs(args.input)
+        if len(args.input) == 1 and Path(args.input[0]).is_file():
+            input_path = inputs[0]
+            name = input_path.stem
+            extension = ENCODER_PROFILES[args.encoder].get("extension", input_path.suffix)
+            output_path = Path(args.output or f"{name}_cleaned{extension}")
+            tmpdir = Path(args.tmpdir or f"frames_{name}")
+            try:
+                stats = process_video(input_path, output_path, tmpdir, args)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+            if args.report:
+                write_report(args.report, [stats])
+            if not stats["ok"]:
+                sys.exit(1)
+            return
+
+        if not inputs:
+            if len(args.input) == 1 and not glob.has_magic(args.input[0]) and not Path(args.input[0]).is_dir():
+                print(f"Error: input file '{args.input[0]}' not found.")
+            else:
+                print(f"Error: no input videos found in {', '.join(args.input)}.")
+            sys.exit(1)
+        if args.output:
+            print("Error: -o/--output names a single file; use --output-dir with several inputs.")
+            sys.exit(1)
+        if run_batch(inputs, args):
+            sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()